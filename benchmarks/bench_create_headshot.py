@@ -0,0 +1,274 @@
+"""
+Benchmark `create_headshot` offline, with the cached Rekognition API
+responses for the images in `examples/`.
+
+Each example image is benchmarked as-is, and as synthetic variants that are
+scaled up to a target resolution (4K, 12 MP and 48 MP), and encoded as JPEG
+and PNG. Since the bounding boxes in the API responses are relative to the
+image size, the same responses apply to the scaled-up variants.
+
+Results -- throughput and latency percentiles for each stage -- are written
+to a JSON file, which can be compared against a baseline to gate
+regressions.
+
+Usage::
+
+    $ python benchmarks/bench_create_headshot.py --variants original,12mp
+    $ python benchmarks/bench_create_headshot.py --baseline baseline.json
+
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from os import cpu_count
+from pathlib import Path
+from tempfile import gettempdir
+from time import perf_counter
+
+import cv2 as cv
+import numpy as np
+import PIL
+
+from profile_photo import create_headshot
+from profile_photo.__version__ import __version__
+from profile_photo.utils.create_headshot import decode_oriented_im
+
+
+ROOT = Path(__file__).resolve().parent.parent
+EXAMPLES = ROOT / 'examples'
+RESPONSES = EXAMPLES / 'responses'
+
+# target resolution of synthetic variants, in megapixels
+VARIANT_TO_MEGAPIXELS = {
+    'original': None,
+    '4k': 3840 * 2160 / 1e6,
+    '12mp': 12.0,
+    '48mp': 48.0,
+}
+
+FORMAT_TO_EXT = {
+    'jpeg': '.jpg',
+    'png': '.png',
+}
+
+# stages in `Timings` which are reported on
+STAGES = ('load_to_model', 'orientation', 'best_fit', 'decode',
+          'transform', 'encode', 'total')
+
+PERCENTILES = (50, 90, 99)
+
+# image data and API responses for a benchmark case, in each worker
+_images: dict[str, tuple[bytes, dict, dict]] = {}
+
+
+def get_example_images() -> list[Path]:
+    return sorted(p for p in EXAMPLES.iterdir()
+                  if p.is_file() and '-out' not in p.stem)
+
+
+def make_variant(path: Path, variant: str, fmt: str, cache_dir: Path) -> Path:
+    """
+    Return the path to a (cached) variant of an example image, scaled up to
+    the resolution of `variant` and encoded as `fmt`.
+    """
+    megapixels = VARIANT_TO_MEGAPIXELS[variant]
+    if megapixels is None and fmt == 'jpeg' and path.suffix.lower() in ('.jpg', '.jpeg'):
+        return path
+
+    out_path = cache_dir / f'{path.stem}-{variant}{FORMAT_TO_EXT[fmt]}'
+    if out_path.exists():
+        return out_path
+
+    # orientation is applied, as the API responses are for the oriented image
+    im = decode_oriented_im(path.read_bytes())
+
+    if megapixels:
+        height, width = im.shape[:2]
+        ratio = (megapixels * 1e6 / (width * height)) ** 0.5
+        im = cv.resize(im, (round(width * ratio), round(height * ratio)),
+                       interpolation=cv.INTER_LINEAR)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cv.imwrite(str(out_path), im)
+
+    return out_path
+
+
+def _load_images(cases: dict[str, tuple[str, str, str]]):
+    """Load image data and API responses, once per worker."""
+    for name, (path, faces_path, labels_path) in cases.items():
+        _images[name] = (Path(path).read_bytes(),
+                         json.loads(Path(faces_path).read_text()),
+                         json.loads(Path(labels_path).read_text()))
+
+
+def _run_one(name: str) -> dict[str, float]:
+    im_bytes, faces, labels = _images[name]
+
+    photo = create_headshot(im_bytes, faces=faces, labels=labels,
+                            file_ext=Path(name).suffix)
+
+    return photo.timings.as_dict()
+
+
+def run_case(cases: dict[str, tuple[str, str, str]], mode: str, workers: int,
+             repeat: int) -> dict:
+    """
+    Run `create_headshot` on each image in `cases`, `repeat` times, with a
+    pool of `workers` threads or processes.
+    """
+    if mode == 'process':
+        method = 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+        pool = ProcessPoolExecutor(workers, mp_context=get_context(method),
+                                   initializer=_load_images, initargs=(cases, ))
+    else:
+        _load_images(cases)
+        pool = ThreadPoolExecutor(workers)
+
+    with pool:
+        # warm up the workers
+        list(pool.map(_run_one, list(cases) * workers))
+
+        names = list(cases) * repeat
+        start = perf_counter()
+        results = list(pool.map(_run_one, names))
+        wall = perf_counter() - start
+
+    stages = {}
+    for stage in STAGES:
+        values = np.array([r[stage] for r in results]) * 1000
+        stages[stage] = {
+            'mean_ms': round(float(values.mean()), 3),
+            **{f'p{p}_ms': round(float(v), 3)
+               for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+            'max_ms': round(float(values.max()), 3),
+        }
+
+    return {
+        'images': len(names),
+        'wall_s': round(wall, 3),
+        'throughput_ips': round(len(names) / wall, 2),
+        'stages': stages,
+    }
+
+
+def compare(results: list[dict], baseline: dict, max_regression: float) -> list[str]:
+    """
+    Compare results against a baseline, and return a list of regressions --
+    where the throughput, or p50 latency of a stage, is worse by more than
+    `max_regression` (as a fraction).
+    """
+    def case_key(r):
+        return r['variant'], r['format'], r['mode'], r['workers']
+
+    baseline_results = {case_key(r): r for r in baseline['results']}
+    regressions = []
+
+    for r in results:
+        if (base := baseline_results.get(case_key(r))) is None:
+            continue
+
+        name = '{}/{}/{}x{}'.format(*case_key(r))
+
+        if r['throughput_ips'] < base['throughput_ips'] * (1 - max_regression):
+            regressions.append(f'{name}: throughput {base["throughput_ips"]} '
+                               f'-> {r["throughput_ips"]} images/s')
+
+        for stage, stats in r['stages'].items():
+            base_p50 = base['stages'].get(stage, {}).get('p50_ms')
+            if base_p50 and stats['p50_ms'] > base_p50 * (1 + max_regression):
+                regressions.append(f'{name}: {stage} p50 {base_p50} '
+                                   f'-> {stats["p50_ms"]} ms')
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--variants', default='original,4k,12mp,48mp',
+                        help='comma-separated variants: %(default)s')
+    parser.add_argument('--formats', default='jpeg,png',
+                        help='comma-separated formats: %(default)s')
+    parser.add_argument('--modes', default='thread,process',
+                        help='comma-separated pool types: %(default)s')
+    parser.add_argument('--workers', default=f'1,{cpu_count() or 1}',
+                        help='comma-separated pool sizes: %(default)s')
+    parser.add_argument('--images', default=None,
+                        help='comma-separated example images (default: all)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of times to process each image: %(default)s')
+    parser.add_argument('--cache-dir', type=Path,
+                        default=Path(gettempdir()) / 'profile-photo-bench',
+                        help='folder for the synthetic images: %(default)s')
+    parser.add_argument('--output', type=Path, default=Path('benchmark-results.json'),
+                        help='output JSON file: %(default)s')
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help='JSON file of earlier results, to check for regressions')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed regression vs. the baseline: %(default)s')
+    args = parser.parse_args(argv)
+
+    images = get_example_images()
+    if args.images:
+        names = args.images.split(',')
+        images = [p for p in images if p.name in names or p.stem in names]
+
+    results = []
+
+    for variant in args.variants.split(','):
+        for fmt in args.formats.split(','):
+            cases = {}
+            for path in images:
+                variant_path = make_variant(path, variant, fmt, args.cache_dir)
+                cases[f'{path.stem}-{variant}{FORMAT_TO_EXT[fmt]}'] = (
+                    str(variant_path),
+                    str(RESPONSES / f'{path.stem}_DetectFaces.json'),
+                    str(RESPONSES / f'{path.stem}_DetectLabels.json'),
+                )
+
+            for mode in args.modes.split(','):
+                for workers in sorted({int(w) for w in args.workers.split(',')}):
+                    result = run_case(cases, mode, workers, args.repeat)
+                    results.append({'variant': variant, 'format': fmt,
+                                    'mode': mode, 'workers': workers, **result})
+
+                    total = result['stages']['total']
+                    print(f'{variant:>8} {fmt:>4} {mode:>7} x{workers:<3} '
+                          f'{result["throughput_ips"]:>8.2f} images/s  '
+                          f'p50={total["p50_ms"]:.1f}ms p99={total["p99_ms"]:.1f}ms')
+
+    report = {
+        'metadata': {
+            'profile_photo': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': cpu_count(),
+            'opencv': cv.__version__,
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f'Results saved to {args.output}')
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.max_regression)
+        for r in regressions:
+            print(f'REGRESSION: {r}', file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
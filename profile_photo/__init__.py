@@ -21,11 +21,13 @@ For full documentation and more advanced usage, please see
 
 __all__ = [
     'create_headshot',
+    'create_headshot_async',
+    'create_headshots',
 ]
 
 import logging
 
-from .main import create_headshot
+from .main import create_headshot, create_headshot_async, create_headshots
 from .log import LOG
 
 # Set up logging to ``/dev/null`` like a library is supposed to.
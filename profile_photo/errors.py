@@ -29,7 +29,8 @@ class FileTooLarge(ProfilePhotoError):
         msg = (f'The size of image as raw bytes ({size}) is greater '
                f'than {max_size} bytes.\n\n'
                f'Resolution: Upload the image to S3 and pass in '
-               f'`bucket` and `key` instead.')
+               f'`bucket` and `key` instead, or pass in `analysis_size` '
+               f'to send a downscaled copy of the image.')
 
         super(FileTooLarge, self).__init__(msg)
 
@@ -64,3 +65,22 @@ class MissingOneOfParams(ProfilePhotoError):
             msg = f'{[params]}: one of these inputs is required'
 
         super(MissingOneOfParams, self).__init__(msg)
+
+
+class ImageMismatch(ProfilePhotoError):
+    """Error raised when a crop plan is applied to a different image."""
+
+    def __init__(self, image_hash: str, expected_hash: str):
+        msg = 'The image does not match the one in the crop plan'
+
+        super(ImageMismatch, self).__init__(msg, image_hash=image_hash,
+                                            expected_hash=expected_hash)
+
+
+class NoFaceDetected(ProfilePhotoError):
+    """Error raised when a face is not detected in an image."""
+
+    def __init__(self, filepath: str | None = None):
+        msg = 'A face is not detected in the image'
+
+        super(NoFaceDetected, self).__init__(msg, filepath=filepath)
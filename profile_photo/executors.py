@@ -0,0 +1,172 @@
+"""
+Executors for the I/O and CPU stages in creating a headshot.
+
+Usage::
+
+    >>> from profile_photo import create_headshot
+    >>> from profile_photo.executors import Executors
+    >>> with Executors(io_workers=32) as executors:
+    >>>     photo = create_headshot(bucket='my-bucket', key='image.jpg',
+    >>>                             executors=executors)
+
+"""
+from __future__ import annotations
+
+__all__ = ['Executors']
+
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from queue import Empty
+from threading import Lock
+from weakref import WeakSet
+
+from .utils.aws.client_cache import ClientCache, pool_connections_for
+
+
+# default number of threads for I/O tasks, such as S3 and Rekognition API calls
+DEFAULT_IO_WORKERS = 16
+
+
+class Executors:
+    """
+    A pair of executors, for the I/O tasks (reading a file, S3 and
+    Rekognition API calls) and the CPU tasks (decoding, cropping and
+    encoding a photo) in creating a headshot.
+
+    The pools are created when first used, and are shut down by
+    :meth:`shutdown`, or on exiting a ``with`` block. After a ``fork()``
+    (for example, in a pre-forking server such as gunicorn), the pools are
+    reset in the child process, and created again when next used.
+
+    :param io_workers: Number of threads for I/O tasks, which mostly wait
+      on the network, defaults to `DEFAULT_IO_WORKERS`
+    :param cpu_workers: Number of threads for CPU tasks, defaults to the
+      number of CPUs
+    :param processes: Number of worker processes for CPU tasks (optional).
+      If passed in, CPU tasks run in a process pool instead of threads.
+    """
+
+    # instances that are reset after a `fork()`
+    _instances: WeakSet[Executors] = WeakSet()
+
+    _default: Executors | None = None
+    _default_lock = Lock()
+
+    def __init__(self, io_workers: int | None = None,
+                 cpu_workers: int | None = None,
+                 processes: int | None = None):
+
+        self.io_workers = io_workers or DEFAULT_IO_WORKERS
+        self.cpu_workers = processes or cpu_workers or os.cpu_count() or 1
+        self.processes = processes
+
+        self._io: ThreadPoolExecutor | None = None
+        self._cpu: Executor | None = None
+        self._lock = Lock()
+
+        self._instances.add(self)
+
+    @classmethod
+    def default(cls) -> Executors:
+        """The (process-wide) executors used when none are passed in."""
+        if (executors := cls._default) is None:
+            with cls._default_lock:
+                if (executors := cls._default) is None:
+                    executors = cls._default = cls()
+
+        return executors
+
+    @property
+    def io(self) -> ThreadPoolExecutor:
+        """The executor for I/O tasks."""
+        if (pool := self._io) is None:
+            with self._lock:
+                if (pool := self._io) is None:
+                    pool = self._io = ThreadPoolExecutor(
+                        self.io_workers, thread_name_prefix='headshot-io')
+
+        return pool
+
+    @property
+    def cpu(self) -> Executor:
+        """The executor for CPU tasks."""
+        if (pool := self._cpu) is None:
+            with self._lock:
+                if (pool := self._cpu) is None:
+                    pool = self._cpu = self._create_cpu_pool()
+
+        return pool
+
+    @property
+    def max_pool_connections(self) -> int:
+        """Size of the connection pool for clients shared by the I/O threads."""
+        return pool_connections_for(self.io_workers)
+
+    def _create_cpu_pool(self) -> Executor:
+        if self.processes:
+            # avoid `fork`, as the I/O threads might already be running
+            method = 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+            return ProcessPoolExecutor(self.processes, mp_context=get_context(method))
+
+        return ThreadPoolExecutor(self.cpu_workers, thread_name_prefix='headshot-cpu')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Shut down the executors, which are created again if used."""
+        with self._lock:
+            pools, self._io, self._cpu = (self._io, self._cpu), None, None
+
+        for pool in pools:
+            if pool is None:
+                continue
+
+            # `cancel_futures` is only supported in Python 3.9+
+            if sys.version_info >= (3, 9):
+                pool.shutdown(wait, cancel_futures=cancel_futures)
+            else:
+                if cancel_futures:
+                    _cancel_pending(pool)
+                pool.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _after_fork(self):
+        # the threads of the pools are not copied to the child process,
+        # so the pools can't be used (or shut down) there
+        self._io = self._cpu = None
+        self._lock = Lock()
+
+
+def _cancel_pending(pool: Executor):
+    """Cancel the futures which are not yet running, as in Python 3.9+."""
+    if isinstance(pool, ThreadPoolExecutor):
+        while True:
+            try:
+                work_item = pool._work_queue.get_nowait()
+            except Empty:
+                break
+            if work_item is not None:
+                work_item.future.cancel()
+
+    elif isinstance(pool, ProcessPoolExecutor):
+        for work_item in list(pool._pending_work_items.values()):
+            work_item.future.cancel()
+
+
+def _after_fork_in_child():
+    Executors._default_lock = Lock()
+    for executors in list(Executors._instances):
+        executors._after_fork()
+
+    # connections in the pools of `boto3` clients are shared with the parent
+    ClientCache._lock = Lock()
+    ClientCache.clear_clients()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
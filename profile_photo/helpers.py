@@ -1,22 +1,11 @@
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor
-
-from dataclass_wizard.decorators import cached_class_property
-
 from .errors import FileTooLarge, MissingParams
 from .models import Params
 
 
 class Util:
     """Helper Utilities."""
-    pool: ThreadPoolExecutor
-    max_threads = 3
-
-    # noinspection PyMethodParameters
-    @cached_class_property
-    def pool(cls):
-        return ThreadPoolExecutor(max_workers=cls.max_threads)
 
     @staticmethod
     def validate_file_len(size: int, _max_size=5_000_000):
@@ -1,19 +1,40 @@
 """Main module."""
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import (FIRST_COMPLETED, Executor, Future,
+                                ProcessPoolExecutor, wait)
+from multiprocessing.shared_memory import SharedMemory
 from os import stat, PathLike
 from pathlib import Path
 from sys import getsizeof
+from time import perf_counter
+from traceback import clear_frames
+from typing import Awaitable, Callable, Iterable, Iterator, Tuple, Union
 
+from .executors import Executors
 from .helpers import Util
-from .models import Params, ProfilePhoto
-from .utils.aws.rekognition import Rekognition
-from .utils.aws.rekognition_models import DetectFacesResp, DetectLabelsResp
+from .log import LOG
+from .models import HeadshotResult, Params, ProfilePhoto, Timings
+from .utils.aws.client_cache import ClientCache
+from .utils.aws.rekognition import FaceAttributes, Rekognition
+from .utils.aws.rekognition_models import DetectFacesResp, DetectLabelsResp, ParseMode
+from .utils.aws.rekognition_utils import FacesFirst
+from .utils.aws.response_cache import ResponseCache
 from .utils.aws.s3 import S3Helper
-from .utils.create_headshot import rotate_im_and_crop
+from .utils.create_headshot import (downscale_for_analysis, rotate_im_and_crop,
+                                    rotate_im_and_crop_all)
+from .utils.detectors import Detector
+from .utils.encoders import Encoding
+from .utils.img_orient import ImageHeader
 from .utils.json_util import load_to_model
 
 
+# An input image for `create_headshots`: a local file path, image data as
+# bytes, or a (bucket, key) pair for an image in S3.
+HeadshotInput = Union[PathLike, str, bytes, Tuple[str, str]]
+
+
 def create_headshot(
     filepath_or_bytes: PathLike[str] | PathLike[bytes] | str | bytes | None = None,
     *,
@@ -22,11 +43,27 @@ def create_headshot(
     labels: DetectLabelsResp | Path | dict | str | None = None,
     region: str = 'us-east-1',
     profile: str | None = None,
+    endpoint_url: str | None = None,
     bucket: str | None = None,
     key: str | None = None,
     debug: bool = False,
     output_dir: PathLike[str] | PathLike[bytes] | str = None,
-) -> ProfilePhoto:
+    max_size: tuple[int, int] | None = None,
+    renditions: Iterable[int] | None = None,
+    encoding: Encoding | None = None,
+    lossless: bool = False,
+    keep_original: bool = True,
+    analysis_size: int | None = None,
+    cache: ResponseCache | None = None,
+    detector: Detector | None = None,
+    on_timings: Callable[[Timings], None] | None = None,
+    faces_first: FacesFirst | bool = False,
+    all_faces: bool = False,
+    parse_mode: ParseMode = 'full',
+    face_attributes: FaceAttributes = 'all',
+    max_pool_connections: int | None = None,
+    executors: Executors | None = None,
+) -> ProfilePhoto | list[ProfilePhoto]:
     """Create a Headshot Photo of a person, given an image.
 
     :param filepath_or_bytes: Path to a local file, or image data as Bytes
@@ -37,109 +74,766 @@ def create_headshot(
     :param labels: Cached response for the image, from the AWS Rekognition DetectLabels API
     :param region: AWS region, defaults to `us-east-1` if not specified
     :param profile: AWS profile name, used for API calls to AWS Rekognition
+    :param endpoint_url: Endpoint URL for the S3 and Rekognition API calls
+      (optional), for example a :class:`LocalAWSServer` for load testing
     :param bucket: Bucket name, if the image data lives in an S3 Bucket or is > 5MB in size
     :param key: Path to the image (object) in the S3 Bucket
     :param debug: True to log debug messages and show the image
     :param output_dir: Path to a local folder to save the output image
       and API responses (optional)
+    :param max_size: Maximum size of the output image, as a ``(width, height)``
+      tuple (optional). If passed in, the output image is scaled down to fit
+      within this size, and JPEG images are decoded at a reduced resolution
+      where possible.
+    :param renditions: Sizes (in px) of smaller versions of the output image
+      to also create (optional), e.g. ``[64, 128, 256]``. Each version fits
+      within a square of that size, and is resized from the next larger one,
+      so the image is only decoded once. The encoded images are available
+      as `photo.renditions`, and are saved alongside the output image.
+    :param encoding: Settings to encode the output image (optional), such as
+      the format, quality and compression effort -- see :class:`Encoding`.
+      Defaults to the OpenCV settings for the format of `file_ext`.
+    :param lossless: True to crop a JPEG image without decoding and encoding
+      it, which is faster and keeps the original quality. This applies when
+      the image doesn't need to be rotated or resized, and the crop is
+      aligned to the 8 or 16 px blocks of the JPEG. Requires `PyTurboJPEG`
+      or the `jpegtran` tool, and otherwise falls back to the usual crop.
+    :param keep_original: False to not keep the original image data on the
+      photo, which saves memory when many photos are kept -- for example,
+      the results of :func:`create_headshots`. The original image (for the
+      side-by-side view) is then read from the local file, if any, or can be
+      passed in to :meth:`ProfilePhoto.get_side_by_side_image`.
+    :param analysis_size: Maximum width and height (in px) of a downscaled copy
+      of the image, which is sent to the Rekognition API instead of the
+      original image (optional), e.g. `1920`. The image is still cropped from
+      the full-resolution original. This reduces request payload size and
+      latency, and also means images > 5MB don't need to be uploaded to S3.
+    :param cache: Cache for Rekognition API responses (optional), such as a
+      :class:`DiskCache` or :class:`SQLiteCache`. Responses are keyed by a
+      hash of the image data (or the S3 object's ETag) and the API parameters.
+    :param detector: Detector for the face and person in the image (optional),
+      defaults to the AWS Rekognition APIs. For example, pass in an
+      :class:`OpenCVDetector` to detect faces locally, without network calls.
+    :param on_timings: Callback which is passed the :class:`Timings` for the
+      image once the photo is created (optional), e.g. to forward them to a
+      metrics system. The timings are also available as `photo.timings`.
+    :param faces_first: True to call the DetectFaces API first, and only call
+      the DetectLabels API if the face suggests that the 'Person' could change
+      the crop (optional). When it's skipped, the crop is approximate (see
+      :class:`FacesFirst`). Pass in a :class:`FacesFirst` policy to tune
+      this, and to collect stats on how often DetectLabels is skipped.
+    :param all_faces: True to create a headshot for each face detected in the
+      image (e.g. a team photo), instead of only the primary face. The image
+      is decoded once, and each face is matched to the 'Person' which wraps it.
+    :param parse_mode: How the Rekognition API responses are loaded: `full`
+      (the default) loads all fields up front; `lazy` loads each face or
+      label on first access, which is faster for a response with many faces
+      or labels; and `minimal` only loads the fields needed for the crop,
+      i.e. the bounding boxes of the face and person.
+    :param face_attributes: Profile for the DetectFaces API: `all` (the default)
+      requests all facial attributes, such as the emotions and age range;
+      `default` requests the default attributes only, which is faster; and
+      `minimal` also skips loading any attributes, as only the bounding box
+      of the face is needed for the crop.
+    :param max_pool_connections: Size of the connection pool for the S3 and
+      Rekognition clients (optional), which are shared between threads.
+      Defaults to a size for the threads that make the API calls.
+    :param executors: Executors for the I/O calls (optional), which can be
+      shared between calls, defaults to :meth:`Executors.default`. The photo
+      is rendered in the calling thread.
+    :return: a :class:`ProfilePhoto` object, containing the output image and API response data;
+      or a list of them (one for each face) if `all_faces` is passed in
+
+    """
+    job = _HeadshotJob(
+        filepath_or_bytes,
+        file_ext=file_ext, faces=faces, labels=labels,
+        region=region, profile=profile, endpoint_url=endpoint_url,
+        bucket=bucket, key=key,
+        debug=debug, output_dir=output_dir, max_size=max_size,
+        renditions=renditions, encoding=encoding, lossless=lossless,
+        keep_original=keep_original, analysis_size=analysis_size, cache=cache, detector=detector,
+        on_timings=on_timings, faces_first=faces_first, all_faces=all_faces,
+        parse_mode=parse_mode, face_attributes=face_attributes,
+        max_pool_connections=max_pool_connections, executors=executors,
+    )
+
+    # read in image data from a local file (if needed)
+    job.read()
+
+    # call the Rekognition APIs, and retrieve the image from S3 (runs in
+    # background). In faces-first mode, DetectLabels might be called after
+    # DetectFaces.
+    while calls := job.io_calls():
+        futures = {param: job.executors.io.submit(call)
+                   for param, call in calls.items()}
+
+        # join any futures
+        for param, fut in futures.items():
+            job.set_result(param, fut.result())
+
+    # rotate & crop the photo
+    return job.finish(job.render())
+
+
+async def create_headshot_async(
+    filepath_or_bytes: PathLike[str] | PathLike[bytes] | str | bytes | None = None,
+    *,
+    semaphore: asyncio.Semaphore | None = None,
+    executor: Executor | None = None,
+    **kwargs,
+) -> ProfilePhoto | list[ProfilePhoto]:
+    """Create a Headshot Photo of a person, given an image (asyncio version).
+
+    The S3 and Rekognition API calls are awaited without blocking the event
+    loop, or a thread, if `aiobotocore` is installed; otherwise, they run
+    in the I/O executor of `executors` (see :func:`create_headshot`). Only
+    reading a local file and the CPU-bound work (decoding, cropping and
+    encoding the photo) runs in `executor`.
+
+    The `aiobotocore` clients are kept open for each event loop, and are
+    shared between calls; close them with
+    :meth:`ClientCache.close_async_clients` before the loop is closed.
+
+    Usage::
+
+        >>> from profile_photo.utils.aws.client_cache import ClientCache
+        >>> semaphore = asyncio.Semaphore(1000)
+        >>> try:
+        >>>     photos = await asyncio.gather(*[
+        >>>         create_headshot_async(bucket='my-bucket', key=key, semaphore=semaphore)
+        >>>         for key in keys
+        >>>     ])
+        >>> finally:
+        >>>     await ClientCache.close_async_clients()
+
+    :param filepath_or_bytes: Path to a local file, or image data as Bytes
+    :param semaphore: Semaphore to limit the number of images in progress
+      at a time, which should be shared between calls (optional)
+    :param executor: Executor for the CPU-bound work (optional), defaults to
+      the loop's default executor
+    :param kwargs: Keyword arguments to :func:`create_headshot`
     :return: a :class:`ProfilePhoto` object, containing the output image and API response data
 
     """
+    if semaphore is None:
+        return await _create_headshot_async(filepath_or_bytes, executor, **kwargs)
+
+    async with semaphore:
+        return await _create_headshot_async(filepath_or_bytes, executor, **kwargs)
+
+
+async def _create_headshot_async(filepath_or_bytes, executor,
+                                 **kwargs) -> ProfilePhoto | list[ProfilePhoto]:
+    loop = asyncio.get_running_loop()
+
+    job = _HeadshotJob(filepath_or_bytes, **kwargs)
+
+    # read in image data from a local file (if needed)
+    await loop.run_in_executor(executor, job.read)
+
+    # call the Rekognition APIs, and retrieve the image from S3
+    while calls := job.async_io_calls():
+        results = await asyncio.gather(*calls.values())
+
+        for param, result in zip(calls, results):
+            job.set_result(param, result)
+
+    # rotate & crop the photo
+    return job.finish(await loop.run_in_executor(executor, job.render))
+
+
+def create_headshots(
+    inputs: Iterable[HeadshotInput],
+    *,
+    io_workers: int = 16,
+    cpu_workers: int | None = None,
+    max_pending: int | None = None,
+    processes: int | None = None,
+    **kwargs,
+) -> Iterator[HeadshotResult]:
+    """Create Headshot Photos for many images, with bounded concurrency.
+
+    Each image is processed as a pipeline of stages: reading the image from
+    a local file or S3 and calling the Rekognition APIs are I/O stages, and
+    decoding, cropping and encoding the photo is a CPU stage. The stages of
+    different images run concurrently, with separate limits for I/O and CPU
+    work.
+
+    Results are yielded as they complete, which is not necessarily the order
+    of `inputs`. An error for an image does not stop the batch; instead, it
+    is returned on the result for that image.
+
+    Usage::
+
+        >>> from profile_photo import create_headshots
+        >>> for result in create_headshots(['a.jpg', ('my-bucket', 'b.jpg')]):
+        >>>     if result.ok:
+        >>>         result.photo.save_image('results')
+
+    :param inputs: Images to process, where each is a path to a local file,
+      image data as bytes, or a ``(bucket, key)`` pair for an image in S3
+    :param io_workers: Maximum number of concurrent I/O tasks, such as
+      S3 and Rekognition API calls
+    :param cpu_workers: Maximum number of concurrent CPU tasks (image
+      decoding, cropping and encoding), defaults to the number of CPUs
+    :param max_pending: Maximum number of images in progress at a time, which
+      bounds memory usage, defaults to `2 * (io_workers + cpu_workers)`
+    :param processes: Number of worker processes for the CPU stage (optional).
+      If passed in, the CPU stage runs in a process pool instead of threads,
+      so that it scales with the number of cores; image data is passed to
+      the workers via shared memory. Note that the calling script then
+      needs an ``if __name__ == '__main__'`` guard.
+    :param kwargs: Keyword arguments to :func:`create_headshot`, which are
+      applied to each image. If `executors` is passed in, its pools are used
+      (and not shut down) instead of `io_workers`, `cpu_workers` and
+      `processes`.
+    :return: an iterator of :class:`HeadshotResult` objects
+
+    """
+    # executors which are passed in are not shut down
+    if (executors := kwargs.get('executors')) is None:
+        executors = kwargs['executors'] = Executors(io_workers, cpu_workers, processes)
+        owned = executors
+    else:
+        owned = None
+
+    max_pending = max_pending or 2 * (executors.io_workers + executors.cpu_workers)
+
+    io_pool, cpu_pool = executors.io, executors.cpu
+
+    inputs = enumerate(inputs)
+    # future -> (job, stage)
+    pending: dict[Future, tuple[_HeadshotJob, str]] = {}
+    # number of outstanding I/O calls, for each job
+    remaining_calls: dict[_HeadshotJob, int] = {}
+    in_progress = 0
+
+    def start_next() -> bool:
+        for index, _input in inputs:
+            job = _HeadshotJob.from_input(index, _input, **kwargs)
+            pending[io_pool.submit(job.read)] = (job, _READ)
+            return True
+
+        return False
+
+    def submit_io_calls(job: _HeadshotJob):
+        calls = job.io_calls()
+        if not calls:
+            pending[job.submit_render(cpu_pool)] = (job, _RENDER)
+            return
+
+        remaining_calls[job] = len(calls)
+        for param, call in calls.items():
+            pending[io_pool.submit(call)] = (job, param)
+
+    try:
+        while in_progress < max_pending and start_next():
+            in_progress += 1
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for fut in done:
+                job, stage = pending.pop(fut)
+
+                # an earlier stage for the image has already failed
+                if job.error is not None:
+                    continue
+
+                try:
+                    result = fut.result()
+
+                    if stage == _READ:
+                        submit_io_calls(job)
+                        continue
+
+                    if stage != _RENDER:
+                        job.set_result(stage, result)
+                        remaining_calls[job] -= 1
+                        # all I/O calls for the image are complete
+                        if not remaining_calls[job]:
+                            del remaining_calls[job]
+                            # any follow-up calls, or render the photo
+                            submit_io_calls(job)
+                        continue
+
+                    job.finish(result)
+                    if isinstance(result, list):
+                        headshot = HeadshotResult(job.index, job.input, photo=result[0],
+                                                  photos=result)
+                    else:
+                        headshot = HeadshotResult(job.index, job.input, photo=result)
+
+                # an error for the image, in any stage (or in `on_timings`)
+                except Exception as e:
+                    job.error = e
+                    job.close()
+                    remaining_calls.pop(job, None)
+                    headshot = HeadshotResult(job.index, job.input, error=e)
+
+                yield headshot
+
+                # image is done - start on the next one
+                if not start_next():
+                    in_progress -= 1
+
+    finally:
+        # the generator is closed or garbage collected early
+        for fut, (job, _) in pending.items():
+            fut.cancel()
+            job.close()
+
+        if owned is not None:
+            owned.shutdown(wait=False)
+
+
+# stages in processing an image, other than I/O calls (see `Params`)
+_READ = 'read'
+_RENDER = 'render'
+
+
+class _HeadshotJob:
+    """
+    State for processing a single image, split into stages so that they can
+    be scheduled independently:
+
+      * :meth:`read` - read image data from a local file (if needed).
+      * :meth:`io_calls` - calls to retrieve the image from S3, and to the
+        Rekognition APIs, which can run concurrently.
+      * :meth:`render` - rotate & crop the photo, which is CPU-bound.
+
+    """
+
+    def __init__(self,
+                 filepath_or_bytes=None, *,
+                 file_ext=None, faces=None, labels=None,
+                 region='us-east-1', profile=None, endpoint_url=None,
+                 bucket=None, key=None,
+                 debug=False, output_dir=None, max_size=None, renditions=None,
+                 encoding=None, lossless=False, keep_original=True,
+                 analysis_size=None, cache=None, detector=None, on_timings=None,
+                 faces_first=False, all_faces=False, parse_mode='full',
+                 face_attributes='all', max_pool_connections=None, executors=None,
+                 index: int | None = None, _input=None):
 
-    futures = {}
+        self.filepath_or_bytes = filepath_or_bytes
+        self.file_ext = file_ext
+        self.faces = faces
+        self.labels = labels
+        self.region = region
+        self.profile = profile
+        self.endpoint_url = endpoint_url
+        self.bucket = bucket
+        self.key = key
+        self.debug = debug
+        self.output_dir = output_dir
+        self.max_size = max_size
+        self.renditions = renditions
+        self.encoding = encoding
+        self.lossless = lossless
+        self.keep_original = keep_original
+        self.analysis_size = analysis_size
+        self.cache = cache
+        self.detector = detector
+        self.on_timings = on_timings
+        self.faces_first = FacesFirst() if faces_first is True else faces_first or None
+        self.all_faces = all_faces
+        self.parse_mode = parse_mode
+        self.face_attributes = face_attributes
+        # the facial attributes aren't loaded, for the minimal profile
+        self.faces_parse_mode = 'minimal' if face_attributes == 'minimal' else parse_mode
+        self.executors: Executors = executors or Executors.default()
+        # a connection for each I/O thread, so that connections are reused
+        self.max_pool_connections = (max_pool_connections
+                                     or self.executors.max_pool_connections)
 
-    # do we need to make a Rekognition API call?
-    call_rekognition_api = not (faces and labels)
+        # time spent in each stage for the image
+        self.timings = Timings()
+        self._started_at: float | None = None
 
-    # image file path or bytes is passed in
-    if filepath_or_bytes:
+        # position and value of the input, in `create_headshots`
+        self.index = index
+        self.input = _input
+        # error raised while processing, in `create_headshots`
+        self.error: Exception | None = None
 
-        # image data (as bytes) is passed in
-        if isinstance(filepath_or_bytes, bytes):
+        self.filepath = None
+        self.im_bytes = None
+        self.analysis_im_bytes = None
+        # header of an image in S3, from the first part that is retrieved
+        self.header: ImageHeader | None = None
+
+        # image data, shared with a worker process
+        self._shm: SharedMemory | None = None
+
+        # I/O calls which are started, so they are only made once
+        self._io_started: set[Params] = set()
+
+        # do we need to detect the face and person in the image?
+        needs_detection = not (faces and labels)
+        # a local detector runs as part of the CPU stage, in `render`
+        self.detect_locally = needs_detection and getattr(detector, 'is_local', False)
+        # do we need to make a Rekognition (or other detector) API call?
+        self.call_rekognition_api = needs_detection and not self.detect_locally
+
+    @classmethod
+    def from_input(cls, index: int, _input: HeadshotInput, **kwargs):
+        """Create a job for an input image in `create_headshots`."""
+        if isinstance(_input, tuple):
+            bucket, key = _input
+            return cls(bucket=bucket, key=key, index=index, _input=_input, **kwargs)
+
+        return cls(_input, index=index, _input=_input, **kwargs)
+
+    def read(self):
+        self._started_at = perf_counter()
+
+        filepath_or_bytes = self.filepath_or_bytes
+        bucket, key = self.bucket, self.key
+
+        # image file path or bytes is passed in
+        if filepath_or_bytes:
+
+            # do we need to validate that image size is < 5MB?
+            validate_len = (self.call_rekognition_api and not (bucket and key)
+                            and not self.analysis_size)
+
+            # image data (as bytes) is passed in
+            if isinstance(filepath_or_bytes, (bytes, bytearray)):
+                # filepath is same as key
+                self.filepath = key
+                # image bytes is known
+                self.im_bytes = filepath_or_bytes
+                if validate_len:
+                    # validate that image size is < 5MB
+                    im_len = getsizeof(self.im_bytes)
+                    Util.validate_file_len(im_len)
+
+            # local filepath is passed in
+            else:
+                # filepath is known
+                self.filepath = filepath_or_bytes
+                if validate_len:
+                    # validate that image size is < 5MB
+                    im_len = stat(self.filepath).st_size
+                    Util.validate_file_len(im_len)
+                # read image data from local file
+                with self.timings.measure('read'), open(self.filepath, 'rb') as f:
+                    self.im_bytes = f.read()
+
+        # neither file path nor image data is passed in - read in image from S3
+        else:
             # filepath is same as key
-            filepath = key
-            # image bytes is known
-            im_bytes = filepath_or_bytes
-            # do we need to make a Rekognition API call?
-            if call_rekognition_api and not (bucket and key):
-                # validate that image size is < 5MB
-                im_len = getsizeof(im_bytes)
-                Util.validate_file_len(im_len)
-
-        # local filepath is passed in
+            self.filepath = key
+            # check that `bucket` and `key` is passed in
+            Util.validate_params(Params.FILEPATH_OR_BYTES, bucket=bucket, key=key)
+
+        # image data to send to the Rekognition API
+        self.analysis_im_bytes = self.im_bytes
+
+        # downscale the image for analysis (if needed)
+        if (self.call_rekognition_api and self.analysis_size
+                and self.im_bytes and not (bucket and key)):
+            with self.timings.measure('downscale'):
+                self.analysis_im_bytes = downscale_for_analysis(
+                    self.im_bytes, self.analysis_size)
+            Util.validate_file_len(len(self.analysis_im_bytes))
+
+    def io_calls(self) -> dict[Params, Callable[[], object]]:
+        """
+        Return the I/O calls needed for the image, which can run concurrently.
+        The result of each call should be passed to :meth:`set_result`, after
+        which this should be called again for any follow-up calls (i.e. in
+        faces-first mode), until no calls are returned.
+        """
+        calls = {}
+        bucket, key = self.bucket, self.key
+        params = self._next_params()
+
+        # retrieve image from S3
+        if Params.FILEPATH_OR_BYTES in params:
+            calls[Params.FILEPATH_OR_BYTES] = lambda: self._s3().get_object_bytes(
+                bucket, key, on_header=self._set_header)
+
+        if Params.FACES in params or Params.LABELS in params:
+            rekognition = self.detector or self._rekognition(init_client=True)
+            # a custom detector returns responses which are already loaded
+            faces_kwargs = {} if self.detector else {
+                'parse_mode': self.parse_mode, 'attributes': self.face_attributes}
+            labels_kwargs = {} if self.detector else {'parse_mode': self.parse_mode}
+            if Params.FACES in params:
+                # call DetectFaces API on the image
+                calls[Params.FACES] = lambda: rekognition.detect_faces(
+                    bucket, key, self.analysis_im_bytes, self.debug, **faces_kwargs)
+            if Params.LABELS in params:
+                # call DetectLabels API on the image
+                calls[Params.LABELS] = lambda: rekognition.detect_labels(
+                    bucket, key, self.analysis_im_bytes, self.debug, **labels_kwargs)
+
+        return {param: self._timed(param, call) for param, call in calls.items()}
+
+    def async_io_calls(self) -> dict[Params, Awaitable]:
+        """
+        Same as :meth:`io_calls`, but returns awaitables for the calls.
+
+        If `aiobotocore` is not installed, or a custom `detector` is used,
+        the (blocking) calls are run in the executor for I/O calls instead.
+        """
+        if not ClientCache.async_supported() or self.detector is not None:
+            loop = asyncio.get_running_loop()
+            return {param: loop.run_in_executor(self.executors.io, call)
+                    for param, call in self.io_calls().items()}
+
+        calls = {}
+        bucket, key = self.bucket, self.key
+        params = self._next_params()
+
+        # retrieve image from S3
+        if Params.FILEPATH_OR_BYTES in params:
+            calls[Params.FILEPATH_OR_BYTES] = self._s3().get_object_bytes_async(
+                bucket, key, on_header=self._set_header)
+
+        if Params.FACES in params or Params.LABELS in params:
+            rekognition = self._rekognition()
+            if Params.FACES in params:
+                calls[Params.FACES] = rekognition.detect_faces_async(
+                    bucket, key, self.analysis_im_bytes, self.debug,
+                    parse_mode=self.parse_mode, attributes=self.face_attributes)
+            if Params.LABELS in params:
+                calls[Params.LABELS] = rekognition.detect_labels_async(
+                    bucket, key, self.analysis_im_bytes, self.debug,
+                    parse_mode=self.parse_mode)
+
+        return {param: self._timed_async(param, call) for param, call in calls.items()}
+
+    def _s3(self) -> S3Helper:
+        return S3Helper(self.region, self.profile,
+                        max_pool_connections=self.max_pool_connections,
+                        endpoint_url=self.endpoint_url)
+
+    def _rekognition(self, init_client=False) -> Rekognition:
+        return Rekognition(self.region, self.profile, init_client,
+                           max_pool_connections=self.max_pool_connections,
+                           endpoint_url=self.endpoint_url, cache=self.cache)
+
+    def _next_params(self) -> list[Params]:
+        """
+        Return the I/O calls to start next, which haven't been started yet.
+        In faces-first mode, the DetectLabels API is only called once the
+        DetectFaces response is known, and only if it's needed.
+        """
+        params = []
+        started = self._io_started
+
+        # Is the image data already known (or being retrieved)?
+        if self.im_bytes is None and Params.FILEPATH_OR_BYTES not in started:
+            params.append(Params.FILEPATH_OR_BYTES)
+
+        if self.call_rekognition_api:
+            # Is a DetectFaces API Response already passed in?
+            if not self.faces and Params.FACES not in started:
+                params.append(Params.FACES)
+            # Is a DetectLabels API Response already passed in?
+            if (not self.labels and Params.LABELS not in started
+                    and self._needs_labels()):
+                params.append(Params.LABELS)
+
+        started.update(params)
+        return params
+
+    def _needs_labels(self) -> bool:
+        """True if the DetectLabels API should be called for the image."""
+        if self.faces_first is None:
+            return True
+
+        # wait for the DetectFaces response
+        if not self.faces:
+            return False
+
+        self.faces = load_to_model(DetectFacesResp, self.faces, Params.FACES,
+                                   self.faces_parse_mode)
+
+        if (reason := self.faces_first.labels_reason(self.faces)) is None:
+            LOG.info('Skipping DetectLabels API call (faces-first mode)')
+            self.labels = DetectLabelsResp([])
+            return False
+
+        LOG.info('Calling DetectLabels API (faces-first mode), reason=%s', reason)
+        return True
+
+    def _timed(self, param: Params, call: Callable[[], object]) -> Callable[[], object]:
+        def timed_call():
+            with self.timings.measure(_PARAM_TO_STAGE[param]):
+                return call()
+
+        return timed_call
+
+    async def _timed_async(self, param: Params, call: Awaitable):
+        with self.timings.measure(_PARAM_TO_STAGE[param]):
+            return await call
+
+    def _set_header(self, header: ImageHeader | None):
+        # the orientation and size of the image are known before the rest of
+        # it is retrieved, and are not parsed again from the image data
+        if header is not None:
+            LOG.debug('Image header from S3: %s', header)
+        self.header = header
+
+    def set_result(self, param: Params, result):
+        if param is Params.FACES:
+            self.faces = result
+        elif param is Params.LABELS:
+            self.labels = result
         else:
-            # filepath is known
-            filepath = filepath_or_bytes
-            if call_rekognition_api and not (bucket and key):
-                # validate that image size is < 5MB
-                im_len = stat(filepath).st_size
-                Util.validate_file_len(im_len)
-            # read image data from local file
-            with open(filepath, 'rb') as f:
-                im_bytes = f.read()
-
-    # neither file path nor image data is passed in - read in image from S3
-    else:
-        # filepath is same as key
-        filepath = key
-        # image bytes is not yet resolved
-        im_bytes = None
-        _param = Params.FILEPATH_OR_BYTES
-        # check that `bucket` and `key` is passed in
-        Util.validate_params(_param, bucket=bucket, key=key)
-        # retrieve image from S3 (runs in background)
-        futures[_param] = Util.pool.submit(
-            S3Helper(region, profile).get_object_bytes,
-            bucket, key,
+            self.im_bytes = result
+
+    def render(self) -> ProfilePhoto:
+        return _render(self.im_bytes, **self._render_kwargs())
+
+    def submit_render(self, executor: Executor) -> Future:
+        """
+        Submit :meth:`render` to an executor. For a process pool, the image
+        data is passed to the worker via shared memory, rather than pickled.
+        """
+        if not isinstance(executor, ProcessPoolExecutor):
+            return executor.submit(self.render)
+
+        im_len = len(self.im_bytes)
+        self._shm = shm = SharedMemory(create=True, size=max(im_len, 1))
+        shm.buf[:im_len] = self.im_bytes
+
+        return executor.submit(
+            _render_shared, shm.name, im_len, self._render_kwargs())
+
+    def finish(self, photo: ProfilePhoto | list[ProfilePhoto]):
+        """
+        Record the total time for the image, and pass the timings to the
+        `on_timings` callback (if any).
+        """
+        self.close(photo)
+
+        # photos for all faces in an image share the same timings
+        timings = (photo[0] if isinstance(photo, list) else photo).timings
+        timings.total = perf_counter() - self._started_at
+
+        if self.debug:
+            LOG.info('Timings: %s', timings)
+
+        if self.on_timings is not None:
+            self.on_timings(timings)
+
+        return photo
+
+    def close(self, photo: ProfilePhoto | list[ProfilePhoto] | None = None):
+        """
+        Release the shared memory for the image (if any), and attach the
+        original image data to the `photo` rendered by a worker process --
+        or drop it from the `photo`, if `keep_original` is False.
+        """
+        for p in (photo if isinstance(photo, list) else [photo] if photo else []):
+            if not self.keep_original:
+                p._original_im_bytes = None
+            elif p._original_im_bytes is None:
+                p._original_im_bytes = self.im_bytes
+
+        if (shm := self._shm) is not None:
+            self._shm = None
+            shm.close()
+            shm.unlink()
+
+    def _render_kwargs(self) -> dict:
+        """Keyword arguments to :func:`_render`, which can be pickled."""
+        return dict(
+            filepath=self.filepath, faces=self.faces, labels=self.labels,
+            file_ext=self.file_ext, debug=self.debug, max_size=self.max_size,
+            renditions=self.renditions, encoding=self.encoding,
+            lossless=self.lossless, output_dir=self.output_dir, all_faces=self.all_faces,
+            parse_mode=self.parse_mode, faces_parse_mode=self.faces_parse_mode,
+            detector=self.detector if self.detect_locally else None,
+            save_responses=self.call_rekognition_api or self.detect_locally,
+            timings=self.timings, header=self.header,
         )
 
-    if call_rekognition_api:
-        # Is a DetectFaces API Response already passed in?
-        if not faces:
-            _param = Params.FACES
-            # call DetectFaces API on the image (runs in background)
-            futures[_param] = Util.pool.submit(
-                Rekognition(region, profile, init_client=True).detect_faces,
-                bucket, key, im_bytes, debug,
-            )
-        # Is a DetectLabels API Response already passed in?
-        if not labels:
-            _param = Params.LABELS
-            # call DetectLabels API on the image (runs in background)
-            futures[_param] = Util.pool.submit(
-                Rekognition(region, profile, init_client=True).detect_labels,
-                bucket, key, im_bytes, debug,
-            )
-
-    # join any futures
-    if futures:
-        # resolve GetFaces API response
-        _fut = futures.get(Params.FACES)
-        if _fut:
-            faces = _fut.result()
-        # resolve GetLabels API response
-        _fut = futures.get(Params.LABELS)
-        if _fut:
-            labels = _fut.result()
-        # resolve image data from S3
-        _fut = futures.get(Params.FILEPATH_OR_BYTES)
-        if _fut:
-            im_bytes = _fut.result()
+
+# stage in `Timings`, for each I/O call
+_PARAM_TO_STAGE = {
+    Params.FILEPATH_OR_BYTES: 's3_get',
+    Params.FACES: 'detect_faces',
+    Params.LABELS: 'detect_labels',
+}
+
+
+def _render(im_bytes, *, filepath, faces, labels, file_ext, debug, max_size,
+            output_dir, save_responses, timings, detector=None,
+            renditions=None, encoding=None, lossless=False, all_faces=False, parse_mode='full',
+            faces_parse_mode=None, header=None) -> ProfilePhoto | list[ProfilePhoto]:
+    # detect the face and person with a local detector (if needed)
+    if detector is not None:
+        with timings.measure('detect_faces'):
+            detected_faces, detected_labels = detector.detect(im_bytes, debug)
+        faces = faces or detected_faces
+        labels = labels or detected_labels
 
     # transform or load the API responses passed in (if needed)
-    faces = load_to_model(DetectFacesResp, faces, Params.FACES)
-    labels = load_to_model(DetectLabelsResp, labels, Params.LABELS)
+    with timings.measure('load_to_model'):
+        faces = load_to_model(DetectFacesResp, faces, Params.FACES,
+                              faces_parse_mode or parse_mode)
+        labels = load_to_model(DetectLabelsResp, labels, Params.LABELS, parse_mode)
 
-    # rotate & crop the photo
-    photo = rotate_im_and_crop(
-        filepath, faces, labels, file_ext, im_bytes, debug)
+    # rotate & crop the photo (or a photo for each face)
+    if all_faces:
+        photos = rotate_im_and_crop_all(
+            filepath, faces, labels, file_ext, im_bytes, debug, max_size, timings,
+            renditions, encoding, lossless, header)
+    else:
+        photos = [rotate_im_and_crop(
+            filepath, faces, labels, file_ext, im_bytes, debug, max_size, timings,
+            renditions, encoding, lossless, header)]
 
     # save outputs to a local drive (if needed)
     if output_dir:
-        if call_rekognition_api:
-            photo.save_all(output_dir)
-        else:
-            photo.save_image(output_dir)
+        with timings.measure('save'):
+            # API responses are the same for all faces
+            if save_responses:
+                photos[0].save_responses(output_dir)
+            for photo in photos:
+                photo.save_image(output_dir)
+
+    # return the photo(s) as headshot
+    return photos if all_faces else photos[0]
+
+
+def _render_shared(shm_name: str, im_len: int,
+                   render_kwargs: dict) -> ProfilePhoto | list[ProfilePhoto]:
+    """
+    Render a photo in a worker process, where the image data is read from
+    shared memory (without copying it).
+    """
+    shm = SharedMemory(shm_name)
+    im_bytes = shm.buf[:im_len]
+
+    try:
+        photo = _render(im_bytes, **render_kwargs)
+        # the parent process already has the original image data
+        for p in (photo if isinstance(photo, list) else [photo]):
+            p._original_im_bytes = None
+        return photo
+
+    except BaseException as e:
+        # the frames in the traceback can still reference the buffer, which
+        # then can't be released; the traceback is kept, for the parent
+        clear_frames(e.__traceback__)
+        del e
+        raise
 
-    # return the photo as headshot
-    return photo
+    finally:
+        try:
+            im_bytes.release()
+        except BufferError:
+            pass
+        finally:
+            try:
+                shm.close()
+            except BufferError:  # still referenced, e.g. by an array
+                LOG.warning('Shared memory %s is still referenced', shm_name)
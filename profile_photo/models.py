@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, fields
 from enum import Enum
 from functools import cached_property
 from io import BytesIO
 from os import PathLike
 from os.path import splitext, basename
 from pathlib import Path
-from typing import TYPE_CHECKING
+from time import perf_counter
+from hashlib import sha256
+from typing import TYPE_CHECKING, Optional
 
-from PIL import Image
+from dataclass_wizard import JSONWizard
+from PIL import Image, ImageOps
 from PIL.Image import Image as PILImage
 
-from .utils.aws.rekognition_models import DetectLabelsResp, DetectFacesResp
+from .utils.aws.rekognition_models import Coordinates, DetectLabelsResp, DetectFacesResp
+from .utils.aws.rekognition_utils import DEFAULT_FIT, DEFAULT_OFFSET
 from .utils.img_orient import resize_ims_and_concat_h
 
 
@@ -36,6 +41,87 @@ def _get_response_filename(file_name: str, api: str) -> PathLike[str] | str:
     return f'{file_name}_{api}_resp.json'
 
 
+@dataclass
+class Timings:
+    """
+    Wall time (in seconds) spent in each stage of creating a photo.
+
+    Stages that are not run for an image -- for example, the S3 call for a
+    local file -- are zero. Note that the S3 and Rekognition API calls run
+    concurrently, so `total` is usually less than the sum of the stages.
+    """
+    # read the image from a local file
+    read: float = 0.0
+    # downscale a copy of the image for analysis (see `analysis_size`)
+    downscale: float = 0.0
+    # retrieve the image from S3
+    s3_get: float = 0.0
+    # DetectFaces API call (or detecting faces with a local detector)
+    detect_faces: float = 0.0
+    # DetectLabels API call
+    detect_labels: float = 0.0
+    # load the API responses into model classes
+    load_to_model: float = 0.0
+    # read the image header, for the EXIF orientation and size
+    orientation: float = 0.0
+    # compute the crop coordinates
+    best_fit: float = 0.0
+    # decode the image
+    decode: float = 0.0
+    # crop, rotate and resize the image
+    transform: float = 0.0
+    # encode the output image
+    encode: float = 0.0
+    # hash the image data, to check it against a crop plan
+    plan: float = 0.0
+    # save the outputs to a local folder
+    save: float = 0.0
+    # end-to-end time for the image
+    total: float = 0.0
+
+    @contextmanager
+    def measure(self, stage: str):
+        """Add the time spent in the ``with`` block to a `stage`."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, stage, getattr(self, stage) + perf_counter() - start)
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the timings as a dict, e.g. to forward to a metrics system."""
+        return asdict(self)
+
+    def __str__(self):
+        return ', '.join(f'{f.name}={getattr(self, f.name) * 1000:.1f}ms'
+                         for f in fields(self) if getattr(self, f.name))
+
+
+@dataclass
+class CropPlan(JSONWizard):
+    """
+    Plan to crop a headshot from an image, which is the result of the analysis
+    (the Rekognition API calls, and :func:`best_fit_coordinates`).
+
+    A plan can be saved (e.g. with :meth:`to_json`), and later applied to the
+    same image with :func:`render_crop_plan` -- for example, to render it
+    at another size or format, without the API responses.
+    """
+    # SHA-256 hash of the original image data, which is computed when the
+    # plan is first accessed (see `ProfilePhoto.crop_plan`)
+    image_hash: Optional[str]
+    # EXIF orientation of the original image
+    orientation: Optional[int]
+    # crop box in the original image (after orientation correction)
+    coordinates: Coordinates
+    # index of the face (in the DetectFaces response) which the plan is for
+    face_index: int = 0
+    # parameters used in `best_fit_coordinates`
+    fit: float = DEFAULT_FIT
+    x_offset: float = DEFAULT_OFFSET
+    y_offset: float = DEFAULT_OFFSET
+
+
 @dataclass
 class ProfilePhoto:
     filepath: str | None
@@ -46,24 +132,109 @@ class ProfilePhoto:
     labels: DetectLabelsResp
 
     # PRIVATE
-    _original_im_bytes: bytes = field(repr=False)
+    # Original image data, as passed in (i.e. *before* any orientation
+    # correction is applied). This is None if `keep_original` is False.
+    _original_im_bytes: bytes | None = field(repr=False)
+
+    # time spent in each stage of creating the photo
+    timings: Timings = field(default_factory=Timings, repr=False)
+
+    # index of the face (in `faces.face_details`) which the photo is of
+    face_index: int = 0
+
+    # smaller versions of the photo (as encoded bytes), for each size in px
+    renditions: dict[int, bytes] = field(default_factory=dict, repr=False)
+
+    # file extension of the output image (e.g. `.webp`), if it differs from
+    # the extension of the input file
+    file_ext: str | None = None
+
+    # crop box in the original image (after orientation correction, and
+    # before any resize)
+    coordinates: Coordinates | None = None
+
+    # PRIVATE
+    # plan to crop the photo again, without the hash of the image (yet)
+    _crop_plan: CropPlan | None = field(default=None, repr=False)
 
     # default filename
     _DEFAULT_FILENAME = 'output.jpg'
 
+    # properties which cache a PIL Image, see `clear_cache()`
+    _CACHED_IMAGES = ('image', 'original_image', 'side_by_side_image')
+
     @cached_property
     def image(self) -> PILImage:
         """Returns the final photo as a PIL Image."""
         return Image.open(BytesIO(self.im_bytes))
 
+    @cached_property
+    def original_image(self) -> PILImage:
+        """
+        Returns the original photo as a PIL Image, with orientation
+        correction applied (if needed).
+
+        If the original image data was not kept, it's read from `filepath`.
+        """
+        return self._open_original()
+
+    @property
+    def crop_plan(self) -> CropPlan | None:
+        """
+        Returns the plan to crop the photo again from the original image,
+        see :class:`CropPlan`.
+
+        The original image data is hashed on first access, rather than for
+        every photo. If the data was not kept, it's read from `filepath`.
+        """
+        if (plan := self._crop_plan) is not None and plan.image_hash is None:
+            plan.image_hash = sha256(self._get_original_im_bytes()).hexdigest()
+
+        return plan
+
     @cached_property
     def side_by_side_image(self) -> PILImage:
         """
         Returns a horizontally concatenated photo (before and after)
         as a PIL Image.
         """
-        orig_im = Image.open(BytesIO(self._original_im_bytes))
-        return resize_ims_and_concat_h(orig_im, self.image)
+        return resize_ims_and_concat_h(self.original_image, self.image)
+
+    def get_side_by_side_image(self, original_im_bytes: bytes | None = None) -> PILImage:
+        """
+        Build the side-by-side photo on demand, without caching it (or the
+        original image) on this object. The original image data can be
+        passed in, if it was not kept.
+        """
+        return resize_ims_and_concat_h(self._open_original(original_im_bytes),
+                                       Image.open(BytesIO(self.im_bytes)))
+
+    def clear_cache(self, original=False):
+        """
+        Free the PIL Images cached by the `image`, `original_image` and
+        `side_by_side_image` properties, which are created again if used.
+
+        If `original` is True, also free the original image data.
+        """
+        for name in self._CACHED_IMAGES:
+            self.__dict__.pop(name, None)
+
+        if original:
+            self._original_im_bytes = None
+
+    def _open_original(self, original_im_bytes: bytes | None = None) -> PILImage:
+        im = Image.open(BytesIO(original_im_bytes or self._get_original_im_bytes()))
+        return ImageOps.exif_transpose(im) if self.is_rotated else im
+
+    def _get_original_im_bytes(self) -> bytes:
+        if (im_bytes := self._original_im_bytes) is not None:
+            return im_bytes
+
+        if self.filepath and Path(self.filepath).is_file():
+            return Path(self.filepath).read_bytes()
+
+        raise ValueError('The original image data was not kept, pass in '
+                         '`keep_original=True` to create_headshot()')
 
     def show(self, side_by_side=True, title='Profile Photo'):
         """
@@ -92,9 +263,18 @@ class ProfilePhoto:
         folder.mkdir(exist_ok=True)
 
         filename, ext = splitext(fp if (fp := self.filepath) else self._DEFAULT_FILENAME)
-        out_filename = get_filename(basename(filename), ext)
+        file_stem = basename(filename)
+        ext = self.file_ext or ext
+        # distinguish the photos of other faces in the same image
+        if self.face_index:
+            file_stem = f'{file_stem}-{self.face_index}'
+        out_filename = get_filename(file_stem, ext)
+
+        # the photo is already encoded, so it's saved as-is
+        (folder / out_filename).write_bytes(self.im_bytes)
 
-        self.image.save(folder / out_filename)
+        for size, im_bytes in self.renditions.items():
+            (folder / get_filename(f'{file_stem}-{size}px', ext)).write_bytes(im_bytes)
 
     def save_responses(self, folder: Path | str | None = None,
                        get_filename: GetResponseFileName = _get_response_filename):
@@ -135,6 +315,27 @@ class ProfilePhoto:
         return Path(fp).parent
 
 
+@dataclass
+class HeadshotResult:
+    """
+    Result for an input image in :func:`create_headshots` -- either the
+    output `photo`, or an `error` if the image could not be processed.
+    """
+    # position of the image in the inputs
+    index: int
+    # input image, as passed in
+    input: object = field(repr=False)
+    photo: ProfilePhoto | None = None
+    error: Exception | None = None
+    # photos for all faces in the image, if `all_faces` is passed in
+    photos: list[ProfilePhoto] | None = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        """True if the image was processed successfully."""
+        return self.error is None
+
+
 class StrEnum(str, Enum):
 
     @classmethod
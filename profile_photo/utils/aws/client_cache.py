@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-from collections import defaultdict
+import asyncio
 from dataclasses import dataclass, InitVar
+from threading import Lock
 from typing import ClassVar
+from weakref import WeakKeyDictionary
 
 from boto3 import Session, client
 from botocore.client import BaseClient
 from botocore.config import Config
 from botocore.exceptions import UnknownServiceError
 
+try:
+    from aiobotocore.session import AioSession
+except ImportError:  # pragma: no cover
+    AioSession = None
+
 
 @dataclass
 class ClientCache:
@@ -19,7 +26,13 @@ class ClientCache:
     # sub-classes can specify that client objects should be thread-safe
     THREAD_SAFE: ClassVar[bool] = False
 
-    _clients: ClassVar[defaultdict] = defaultdict(dict)
+    # clients for each (service, region, profile, config), which are shared
+    # between threads; the lock ensures a client is only created once
+    _clients: ClassVar[dict[tuple, BaseClient]] = {}
+    _lock: ClassVar[Lock] = Lock()
+
+    # `aiobotocore` clients, for each event loop
+    _async_clients: ClassVar[WeakKeyDictionary] = WeakKeyDictionary()
 
     # The specified region that is bound to a client. Default to 'us-east-1'.
     region_name: str = 'us-east-1'
@@ -32,10 +45,16 @@ class ClientCache:
     # is desirable to reuse the same client between threads.
     init_client: InitVar[bool] = False
 
-    # Maximum pool connections for multi-thread usage
+    # Maximum pool connections for multi-thread usage, which should be at
+    # least the number of threads making requests with the client (see
+    # :func:`pool_connections_for`); defaults to 10 in `botocore`.
     # Ref: https://stackoverflow.com/a/68760777/10237506
     max_pool_connections: int | None = None
 
+    # Optional endpoint URL for the service, for example a local stand-in
+    # server (see :class:`LocalAWSServer`), or an S3-compatible service.
+    endpoint_url: str | None = None
+
     def __post_init__(self, init_client: bool):
         self.region_name = self.region_name.lower()
 
@@ -52,12 +71,37 @@ class ClientCache:
 
     def _get_client(self, region_name):
         """
-        Internal method to return a low-level SecretManager client for a given region name
+        Internal method to return a low-level client for a given region name,
+        which is shared with other instances for the same profile and config.
         """
-        if region_name not in self._clients[self.SERVICE_NAME]:
-            self._clients[self.SERVICE_NAME][region_name] = self._create_client()
+        client_key = self._client_key(region_name)
+
+        try:
+            return self._clients[client_key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            # another thread has created the client in the meantime
+            if (_client := self._clients.get(client_key)) is None:
+                _client = self._clients[client_key] = self._create_client()
 
-        return self._clients[self.SERVICE_NAME][region_name]
+        return _client
+
+    def _client_key(self, region_name: str) -> tuple:
+        """The key for a client in the cache."""
+        return (self.SERVICE_NAME, region_name, self.profile_name,
+                self._config_key())
+
+    def _config_key(self) -> tuple:
+        """The (hashable) config for a client, from :meth:`_client_kwargs`."""
+        return self.endpoint_url, self.max_pool_connections
+
+    @classmethod
+    def clear_clients(cls):
+        """Clear all cached clients, for example after a `fork()`."""
+        with cls._lock:
+            cls._clients.clear()
 
     def _create_client(self) -> BaseClient:
         if not self.SERVICE_NAME:
@@ -70,14 +114,69 @@ class ClientCache:
             else:
                 client_func = client
 
-            client_kwargs = {}
-            if self.max_pool_connections:
-                client_kwargs['config'] = Config(
-                    max_pool_connections=self.max_pool_connections)
-
             return client_func(self.SERVICE_NAME, self.region_name,
-                               **client_kwargs)
+                               **self._client_kwargs())
 
         except UnknownServiceError:
             raise NotImplementedError(
                 'Sub-classes must override this method')
+
+    def _client_kwargs(self) -> dict:
+        """Keyword arguments to create a client with."""
+        client_kwargs = {}
+        if self.endpoint_url:
+            client_kwargs['endpoint_url'] = self.endpoint_url
+        if self.max_pool_connections:
+            client_kwargs['config'] = Config(
+                max_pool_connections=self.max_pool_connections)
+
+        return client_kwargs
+
+    @staticmethod
+    def async_supported() -> bool:
+        """True if `aiobotocore` is installed, for non-blocking API calls."""
+        return AioSession is not None
+
+    async def get_async_client(self):
+        """
+        Return an `aiobotocore` client for the region, which is cached for
+        the running event loop.
+
+        Clients are closed with :meth:`close_async_clients`.
+        """
+        clients = self._async_clients.setdefault(asyncio.get_running_loop(), {})
+        client_key = self._client_key(self.region_name)
+
+        if (_client := clients.get(client_key)) is None:
+            session = AioSession(profile=self.profile_name)
+            _client = await session.create_client(
+                self.SERVICE_NAME, self.region_name, **self._client_kwargs()
+            ).__aenter__()
+
+            # another task has created a client in the meantime
+            if client_key in clients:
+                await _client.__aexit__(None, None, None)
+            else:
+                clients[client_key] = _client
+
+        return clients[client_key]
+
+    @classmethod
+    async def close_async_clients(cls):
+        """Close all `aiobotocore` clients for the running event loop."""
+        clients = cls._async_clients.pop(asyncio.get_running_loop(), {})
+
+        for _client in clients.values():
+            await _client.__aexit__(None, None, None)
+
+
+def pool_connections_for(concurrency: int) -> int:
+    """
+    Return the size of the connection pool for a client, which is shared
+    by `concurrency` threads (or tasks) making requests.
+
+    The pool is at least the `botocore` default of 10 connections, and sizes
+    are rounded up to a multiple of 10, so that similar settings share a
+    (cached) client.
+    """
+    return max(10, -(-concurrency // 10) * 10)
@@ -0,0 +1,360 @@
+"""
+A local stand-in server for the Rekognition and S3 APIs, for load testing
+without network access (or AWS costs).
+
+Rekognition API calls are answered with cached JSON responses, such as the
+ones in ``examples/responses/``, and S3 objects are served from a local
+folder. The latency of each request, and the rate of throttling errors, are
+configurable.
+
+Usage::
+
+    >>> from profile_photo import create_headshot
+    >>> from profile_photo.utils.aws.local_server import LocalAWSServer
+    >>> with LocalAWSServer('examples/responses', 'examples', latency=0.2) as server:
+    >>>     photo = create_headshot(bucket='examples', key='boy-1.jpg',
+    >>>                             endpoint_url=server.endpoint_url)
+
+Or from the command line::
+
+    $ python -m profile_photo.utils.aws.local_server examples/responses examples --port 9000
+
+Note that boto3 still needs (any) credentials to sign requests, for example
+by setting the ``AWS_ACCESS_KEY_ID`` and ``AWS_SECRET_ACCESS_KEY``
+environment variables.
+"""
+from __future__ import annotations
+
+__all__ = ['LocalAWSServer']
+
+import argparse
+import base64
+import json
+import logging
+import random
+from collections import Counter
+from email.utils import formatdate
+from hashlib import md5, sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mimetypes import guess_type
+from os import PathLike
+from pathlib import Path
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import unquote, urlsplit
+from xml.sax.saxutils import escape
+
+from ...log import LOG
+
+
+class LocalAWSServer:
+    """
+    Local stand-in server for the Rekognition and S3 APIs.
+
+    The response for a Rekognition API call is read from
+    ``{responses_dir}/{stem}_{api}.json``, where `stem` is the stem of the
+    S3 object key, or -- for image data passed as bytes -- the stem of the
+    file in `objects_dir` which has the same content. If there is no match,
+    the responses for `default_stem` are used (if specified).
+
+    S3 objects are read from ``{objects_dir}/{bucket}/{key}``, or otherwise
+    from ``{objects_dir}/{key}``.
+
+    :param responses_dir: Folder with cached Rekognition API responses
+    :param objects_dir: Folder with S3 objects (optional)
+    :param host: Host to listen on
+    :param port: Port to listen on, defaults to a free port
+    :param latency: Delay (in seconds) before each response
+    :param jitter: Maximum random delay (in seconds) added to `latency`
+    :param throttle_rate: Fraction (0-1) of requests which fail with a
+      throttling error, which boto3 retries
+    :param default_stem: Stem of the responses to use for unknown images
+    """
+
+    def __init__(self, responses_dir: PathLike[str] | str,
+                 objects_dir: PathLike[str] | str | None = None,
+                 host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 default_stem: str | None = None):
+
+        self.responses_dir = Path(responses_dir)
+        self.objects_dir = Path(objects_dir) if objects_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.default_stem = default_stem
+
+        # content hash -> stem of the file, for image data passed as bytes
+        self._digest_to_stem = {}
+        if self.objects_dir:
+            for path in self.objects_dir.rglob('*'):
+                if path.is_file() and path.suffix != '.json':
+                    digest = sha256(path.read_bytes()).hexdigest()
+                    self._digest_to_stem[digest] = path.stem
+
+        # request counts (by API name), and the peak number of concurrent
+        # requests, to check the concurrency of clients
+        self.stats = Counter()
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.server = self
+        self._thread: Thread | None = None
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        self._thread = Thread(target=self._httpd.serve_forever,
+                              name='local-aws-server', daemon=True)
+        self._thread.start()
+        LOG.info('Local AWS server running at %s', self.endpoint_url)
+
+    def stop(self):
+        """Stop the server."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self):
+        """Serve requests in the current thread, until interrupted."""
+        LOG.info('Local AWS server running at %s', self.endpoint_url)
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _begin(self, api: str) -> bool:
+        """
+        Record the start of a request, and wait for the configured latency.
+        Return False if the request should fail with a throttling error.
+        """
+        with self._lock:
+            self.stats[api] += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            sleep(delay)
+
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            with self._lock:
+                self.stats['throttled'] += 1
+            return False
+
+        return True
+
+    def _end(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _response_path(self, api: str, image: dict) -> Path | None:
+        if s3_object := image.get('S3Object'):
+            stem = Path(s3_object['Name']).stem
+        else:
+            digest = sha256(base64.b64decode(image['Bytes'])).hexdigest()
+            stem = self._digest_to_stem.get(digest)
+
+        for stem in (stem, self.default_stem):
+            if stem and (path := self.responses_dir / f'{stem}_{api}.json').exists():
+                return path
+
+        return None
+
+    def _object_path(self, bucket: str, key: str) -> Path | None:
+        if self.objects_dir:
+            root = self.objects_dir.resolve()
+            for path in (root / bucket / key, root / key):
+                path = path.resolve()
+                # a key (or bucket) with `..` must not escape `objects_dir`
+                if root in path.parents and path.is_file():
+                    return path
+
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Handle requests for the Rekognition (JSON) and S3 (REST) APIs.
+
+    Rekognition requests are POSTs with an ``X-Amz-Target`` header, such as
+    ``RekognitionService.DetectFaces``; S3 requests use path-style URLs.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server: ThreadingHTTPServer
+
+    @property
+    def aws(self) -> LocalAWSServer:
+        return self.server.server
+
+    def log_message(self, fmt, *args):
+        LOG.debug('%s - %s', self.address_string(), fmt % args)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        target = self.headers.get('X-Amz-Target', '')
+        api = target.rpartition('.')[2]
+
+        if not self.aws._begin(api):
+            self._send_json(400, {'__type': 'ThrottlingException',
+                                  'message': 'Rate exceeded'})
+            self.aws._end()
+            return
+
+        try:
+            if not target.startswith('RekognitionService.'):
+                self._send_json(400, {'__type': 'UnknownOperationException',
+                                      'message': f'Unknown operation: {target}'})
+                return
+
+            image = json.loads(body).get('Image', {})
+
+            if (path := self.aws._response_path(api, image)) is None:
+                self._send_json(400, {'__type': 'InvalidParameterException',
+                                      'message': f'No cached {api} response for the image'})
+                return
+
+            self._send_json(200, _to_api_case(json.loads(path.read_text())))
+
+        finally:
+            self.aws._end()
+
+    def do_GET(self):
+        self._handle_s3(send_body=True)
+
+    def do_HEAD(self):
+        self._handle_s3(send_body=False)
+
+    def _handle_s3(self, send_body: bool):
+        bucket, _, key = unquote(urlsplit(self.path).path).lstrip('/').partition('/')
+
+        if not self.aws._begin('GetObject' if send_body else 'HeadObject'):
+            self._send_s3_error(503, 'SlowDown', 'Please reduce your request rate.',
+                                send_body)
+            self.aws._end()
+            return
+
+        try:
+            if (path := self.aws._object_path(bucket, key)) is None:
+                self._send_s3_error(404, 'NoSuchKey', 'The specified key does not exist.',
+                                    send_body)
+                return
+
+            data = path.read_bytes()
+            etag = md5(data).hexdigest()
+            status, headers = 200, {}
+
+            # support a single byte range, e.g. `bytes=0-65535`
+            if (range_header := self.headers.get('Range', '')).startswith('bytes='):
+                size = len(data)
+                start, _, end = range_header[6:].partition('-')
+                if start:
+                    start, end = int(start), min(int(end) if end else size - 1, size - 1)
+                else:  # suffix range, e.g. `bytes=-500`
+                    start, end = max(size - int(end), 0), size - 1
+
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                status, data = 206, data[start:end + 1]
+
+            self.send_response(status)
+            self.send_header('Content-Type', guess_type(path.name)[0] or 'binary/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('ETag', f'"{etag}"')
+            self.send_header('Last-Modified', formatdate(path.stat().st_mtime, usegmt=True))
+            self.send_header('Accept-Ranges', 'bytes')
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            if send_body:
+                self.wfile.write(data)
+
+        finally:
+            self.aws._end()
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_s3_error(self, status: int, code: str, message: str, send_body: bool):
+        body = (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Error><Code>{code}</Code><Message>{escape(message)}</Message>'
+                f'<Resource>{escape(self.path)}</Resource></Error>').encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if send_body:
+            self.wfile.write(body)
+
+
+def _to_api_case(o):
+    """
+    Convert the keys in a cached response (which might be saved in camel
+    case, see :meth:`ProfilePhoto.save_responses`) to the Pascal case used
+    by the API, so that botocore can parse the response.
+    """
+    if isinstance(o, dict):
+        return {k[:1].upper() + k[1:]: _to_api_case(v) for k, v in o.items()}
+    if isinstance(o, list):
+        return [_to_api_case(v) for v in o]
+    return o
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local stand-in server for the '
+                                                 'Rekognition and S3 APIs.')
+    parser.add_argument('responses_dir', help='folder with cached Rekognition API responses')
+    parser.add_argument('objects_dir', nargs='?', help='folder with S3 objects')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='delay (in seconds) before each response')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='maximum random delay (in seconds) added to the latency')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='fraction of requests which fail with a throttling error')
+    parser.add_argument('--default-stem', default=None,
+                        help='stem of the responses to use for unknown images')
+    args = parser.parse_args(argv)
+
+    LOG.addHandler(logging.StreamHandler())
+    LOG.setLevel('INFO')
+
+    server = LocalAWSServer(args.responses_dir, args.objects_dir,
+                            host=args.host, port=args.port,
+                            latency=args.latency, jitter=args.jitter,
+                            throttle_rate=args.throttle_rate,
+                            default_stem=args.default_stem)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
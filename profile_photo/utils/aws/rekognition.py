@@ -1,65 +1,211 @@
 from __future__ import annotations
 
+import asyncio
 import json
 from dataclasses import dataclass
+from typing import Literal
 
 from .client_cache import ClientCache
-from .rekognition_models import DetectLabelsResp, DetectFacesResp
+from .rekognition_models import DetectLabelsResp, DetectFacesResp, ParseMode
+from .response_cache import ResponseCache
+from .s3 import S3Helper
 from ...log import LOG
 
 
+# Profile for the DetectFaces API, which is one of:
+#   * minimal - only the bounding box of each face is loaded from the response.
+#   * default - the default attributes, such as the landmarks, pose and quality.
+#   * all - all attributes, such as the age range, emotions and gender.
+FaceAttributes = Literal['minimal', 'default', 'all']
+
+# value of the `Attributes` parameter for the DetectFaces API, for each profile
+_FACE_ATTRIBUTES_PARAM = {
+    'minimal': ['DEFAULT'],
+    'default': ['DEFAULT'],
+    'all': ['ALL'],
+}
+
+
 @dataclass
 class Rekognition(ClientCache):
     SERVICE_NAME = 'rekognition'
 
+    # Optional cache for API responses
+    cache: ResponseCache | None = None
+
     def detect_labels(self, bucket: str, key: str, im_bytes: bytes | None = None,
-                      debug=False, confidence=55):
+                      debug=False, confidence=55, parse_mode: ParseMode = 'full'):
         """
-        Call the DetectLabels API on an image, or use the DynamoDB cache if
-        needed.
+        Call the DetectLabels API on an image, or use the response cache if
+        one is configured. See :meth:`DetectLabelsResp.load` for `parse_mode`.
 
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/rekognition.html#Rekognition.Client.detect_labels
         """
-        resp = self.client.detect_labels(
-            Image=self._im_param(bucket, key, im_bytes),
+        resp = self._call_api(
+            'DetectLabels', self.client.detect_labels, bucket, key, im_bytes,
             MinConfidence=confidence,
         )
 
         if debug:
             LOG.info('Detect Labels Response:\n  %s', json.dumps(resp))
 
-        return DetectLabelsResp.from_dict(resp)
+        return DetectLabelsResp.load(resp, parse_mode)
 
     def detect_faces(self, bucket: str, key: str, im_bytes: bytes | None = None,
-                     debug=False, all_attrs=True):
+                     debug=False, all_attrs=True, parse_mode: ParseMode = 'full',
+                     attributes: FaceAttributes | None = None):
         """
-        Call the DetectFaces API on an image, or use the DynamoDB cache if
-        needed.
+        Call the DetectFaces API on an image, or use the response cache if
+        one is configured. See :meth:`DetectFacesResp.load` for `parse_mode`.
+
+        The `attributes` profile (if passed in) overrides `all_attrs`. Responses
+        are cached separately for each profile, except that the `minimal` and
+        `default` profiles make the same request.
 
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/rekognition.html#Rekognition.Client.detect_faces
         """
+        attributes, parse_mode = self._face_attributes(all_attrs, parse_mode, attributes)
 
-        kwargs = {
-            'Attributes': ['ALL'] if all_attrs else ['DEFAULT'],
-            'Image': self._im_param(bucket, key, im_bytes)
-        }
-
-        resp = self.client.detect_faces(**kwargs)
+        resp = self._call_api(
+            'DetectFaces', self.client.detect_faces, bucket, key, im_bytes,
+            Attributes=_FACE_ATTRIBUTES_PARAM[attributes],
+        )
 
         if debug:
             LOG.info('Detect Faces Response:\n  %s', json.dumps(resp))
 
-        return DetectFacesResp.from_dict(resp)
+        return DetectFacesResp.load(resp, parse_mode)
 
     def recognize_celebrities(self, bucket: str, key: str, im_bytes: bytes | None = None):
         """
-        Call the RecognizeCelebrities API on an image, or use the DynamoDB
-        cache if needed.
+        Call the RecognizeCelebrities API on an image, or use the response
+        cache if one is configured.
 
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/rekognition.html#Rekognition.Client.recognize_celebrities
         """
-        return self.client.recognize_celebrities(
-            Image=self._im_param(bucket, key, im_bytes))
+        return self._call_api(
+            'RecognizeCelebrities', self.client.recognize_celebrities,
+            bucket, key, im_bytes,
+        )
+
+    async def detect_labels_async(self, bucket: str, key: str, im_bytes: bytes | None = None,
+                                  debug=False, confidence=55,
+                                  parse_mode: ParseMode = 'full'):
+        """
+        Same as :meth:`detect_labels`, but without blocking the event loop.
+        Requires `aiobotocore` to be installed.
+        """
+        _client = await self.get_async_client()
+
+        resp = await self._call_api_async(
+            'DetectLabels', _client.detect_labels, bucket, key, im_bytes,
+            MinConfidence=confidence,
+        )
+
+        if debug:
+            LOG.info('Detect Labels Response:\n  %s', json.dumps(resp))
+
+        return DetectLabelsResp.load(resp, parse_mode)
+
+    async def detect_faces_async(self, bucket: str, key: str, im_bytes: bytes | None = None,
+                                 debug=False, all_attrs=True,
+                                 parse_mode: ParseMode = 'full',
+                                 attributes: FaceAttributes | None = None):
+        """
+        Same as :meth:`detect_faces`, but without blocking the event loop.
+        Requires `aiobotocore` to be installed.
+        """
+        attributes, parse_mode = self._face_attributes(all_attrs, parse_mode, attributes)
+        _client = await self.get_async_client()
+
+        resp = await self._call_api_async(
+            'DetectFaces', _client.detect_faces, bucket, key, im_bytes,
+            Attributes=_FACE_ATTRIBUTES_PARAM[attributes],
+        )
+
+        if debug:
+            LOG.info('Detect Faces Response:\n  %s', json.dumps(resp))
+
+        return DetectFacesResp.load(resp, parse_mode)
+
+    def _call_api(self, api: str, method, bucket: str | None, key: str | None,
+                  im_bytes: bytes | None, **params) -> dict:
+        """
+        Call a Rekognition API `method` on an image, checking the response
+        cache first (if one is configured).
+        """
+        cache = self.cache
+
+        if cache is not None:
+            # S3 objects are identified by their ETag, so that a
+            # modified object does not result in a cache hit.
+            etag = self._s3().get_etag(bucket, key) if bucket else None
+            cache_key = self._cache_key(api, bucket, key, etag, im_bytes, params)
+
+            if (resp := cache.get(cache_key)) is not None:
+                LOG.debug('Using cached %s response', api)
+                return resp
+
+        resp = method(Image=self._im_param(bucket, key, im_bytes), **params)
+        resp.pop('ResponseMetadata', None)
+
+        if cache is not None:
+            cache.set(cache_key, resp)
+
+        return resp
+
+    async def _call_api_async(self, api: str, method, bucket: str | None, key: str | None,
+                              im_bytes: bytes | None, **params) -> dict:
+        """
+        Same as :meth:`_call_api`, where `method` is a coroutine function.
+        The response cache is read and written in the loop's default
+        executor, as it can do file I/O.
+        """
+        cache = self.cache
+        loop = asyncio.get_running_loop()
+
+        if cache is not None:
+            etag = await self._s3().get_etag_async(bucket, key) if bucket else None
+            cache_key = self._cache_key(api, bucket, key, etag, im_bytes, params)
+
+            if (resp := await loop.run_in_executor(None, cache.get, cache_key)) is not None:
+                LOG.debug('Using cached %s response', api)
+                return resp
+
+        resp = await method(Image=self._im_param(bucket, key, im_bytes), **params)
+        resp.pop('ResponseMetadata', None)
+
+        if cache is not None:
+            await loop.run_in_executor(None, cache.set, cache_key, resp)
+
+        return resp
+
+    @staticmethod
+    def _face_attributes(all_attrs: bool, parse_mode: ParseMode,
+                         attributes: FaceAttributes | None) -> tuple[FaceAttributes, ParseMode]:
+        """Resolve the profile for the DetectFaces API, and how to load the response."""
+        if attributes is None:
+            attributes = 'all' if all_attrs else 'default'
+        elif attributes not in _FACE_ATTRIBUTES_PARAM:
+            raise ValueError(f'Invalid face attributes: {attributes!r}')
+
+        # attributes aren't needed, so they're not loaded
+        if attributes == 'minimal':
+            parse_mode = 'minimal'
+
+        return attributes, parse_mode
+
+    def _s3(self) -> S3Helper:
+        """S3 helper for the same region, profile and config."""
+        return S3Helper(self.region_name, self.profile_name,
+                        max_pool_connections=self.max_pool_connections,
+                        endpoint_url=self.endpoint_url)
+
+    def _cache_key(self, api: str, bucket: str | None, key: str | None,
+                   etag: str | None, im_bytes: bytes | None, params: dict) -> str:
+        """Build the key for an API response in the response cache."""
+        image_id = self.cache.image_id(bucket, key, etag, im_bytes)
+        return self.cache.make_key(api, image_id, params)
 
     @staticmethod
     def _im_param(s3_bucket: str = None,
@@ -10,20 +10,30 @@ __all__ = [
     'Label',
     'FaceDetail',
     'BoundingBox',
-    'Landmark'
+    'Landmark',
+    'ParseMode',
 ]
 
-from dataclasses import dataclass
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass, field
 from functools import cached_property
 from typing import List, Literal, Optional
 
-from dataclass_wizard import JSONWizard
+from dataclass_wizard import JSONWizard, asdict, fromdict
 
 from ..dict_helper import DictWithLowerStore
 
 
 ImageOrientation = Literal['ROTATE_0', 'ROTATE_90', 'ROTATE_180', 'ROTATE_270']
 
+# How an API response is loaded as a model:
+#   * full - load all fields in the response.
+#   * lazy - keep the response, and load each face (or label) on first access.
+#   * minimal - only load the fields needed to crop a photo: the bounding box
+#     of each face, and the instances of the 'Person' label.
+ParseMode = Literal['full', 'lazy', 'minimal']
+
 
 @dataclass
 class Coordinates:
@@ -48,7 +58,11 @@ class Coordinates:
 
     @classmethod
     def from_box(cls, im, box: BoundingBox, offset=0, y_offset=0):
-        im_height, im_width = im.shape[:2]
+        """
+        Get coordinates from a (relative) bounding box, where `im` is either
+        an OpenCV image or its shape, as a ``(height, width)`` tuple.
+        """
+        im_height, im_width = (im if isinstance(im, tuple) else im.shape)[:2]
 
         # draw a colored bounding box
         x1_orig = im_width * box.left
@@ -95,6 +109,57 @@ class Coordinates:
 
         return cls(max(x1, 0), max(y1, 0), min(x2, im_width), min(y2, im_height))
 
+    @property
+    def width(self) -> int:
+        return self.x2 - self.x1
+
+    @property
+    def height(self) -> int:
+        return self.y2 - self.y1
+
+    def scale(self, fx: float, fy: float | None = None) -> Coordinates:
+        """
+        Scale the coordinates by a factor of `fx` (and `fy`, for the Y axis),
+        for example to map them onto a resized version of the image.
+        """
+        if fy is None:
+            fy = fx
+
+        return Coordinates(round(self.x1 * fx), round(self.y1 * fy),
+                           round(self.x2 * fx), round(self.y2 * fy))
+
+    def unorient(self, orientation: int | None, shape: tuple[int, ...]) -> Coordinates:
+        """
+        Map coordinates in the oriented (i.e. upright) frame of an image back
+        to its raw, un-oriented frame -- as stored in the file, before the
+        EXIF `orientation` is applied.
+
+        `shape` is the shape of the raw image, as a ``(height, width)`` tuple.
+
+        Cropping the raw image at the returned coordinates, and then
+        correcting the orientation of just the crop, gives the same result
+        as cropping the oriented image at these coordinates.
+        """
+        height, width = shape[:2]
+        x1, y1, x2, y2 = self.x1, self.y1, self.x2, self.y2
+
+        if orientation == 2:  # flip left-right
+            return Coordinates(width - x2, y1, width - x1, y2)
+        if orientation == 3:  # rotate 180
+            return Coordinates(width - x2, height - y2, width - x1, height - y1)
+        if orientation == 4:  # flip top-bottom
+            return Coordinates(x1, height - y2, x2, height - y1)
+        if orientation == 5:  # transpose
+            return Coordinates(y1, x1, y2, x2)
+        if orientation == 6:  # rotate 90 (clockwise)
+            return Coordinates(y1, height - x2, y2, height - x1)
+        if orientation == 7:  # transverse
+            return Coordinates(width - y2, height - x2, width - y1, height - x1)
+        if orientation == 8:  # rotate 90 (counter-clockwise)
+            return Coordinates(width - y2, x1, width - y1, x2)
+
+        return self
+
 
 @dataclass
 class RecognizeCelebritiesResp(JSONWizard):
@@ -133,8 +198,99 @@ class Face:
     quality: 'Quality'
 
 
+class _LazyList(Sequence):
+    """
+    A list of dataclass instances, where each is loaded from the `raw` dict
+    in an API response on first access.
+    """
+    __slots__ = ('cls', 'raw', '_items')
+
+    def __init__(self, cls: type, raw: list[dict]):
+        self.cls = cls
+        self.raw = raw
+        self._items = [None] * len(raw)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        item = self._items[i]
+        if item is None:
+            item = self._items[i] = fromdict(self.cls, self.raw[i])
+
+        return item
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, _LazyList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _get(data: dict, key: str, default=None):
+    """
+    Get a (Pascal-cased) `key` from an API response, which might be saved in
+    camel case (see :meth:`ProfilePhoto.save_responses`).
+    """
+    try:
+        return data[key]
+    except KeyError:
+        return data.get(key[:1].lower() + key[1:], default)
+
+
+def _get_box(data: dict) -> BoundingBox:
+    box = _get(data, 'BoundingBox')
+    return BoundingBox(_get(box, 'Width'), _get(box, 'Height'),
+                       _get(box, 'Left'), _get(box, 'Top'))
+
+
+class _Response:
+    """
+    Mixin for an API response model, which can be loaded lazily (or only
+    partially) with :meth:`load`.
+    """
+    # the API response, if the model is loaded lazily or partially
+    _raw: 'dict | None' = None
+
+    @classmethod
+    def load(cls, data: dict, parse_mode: ParseMode = 'full'):
+        """
+        Load an API response `data` as a model. With a `parse_mode` other than
+        `full`, only the fields which are accessed (or needed to crop a photo)
+        are loaded; this is much faster for a response with many faces or
+        labels.
+        """
+        if parse_mode == 'full':
+            return cls.from_dict(data)
+
+        if parse_mode == 'lazy':
+            model = cls._from_dict_lazy(data)
+        elif parse_mode == 'minimal':
+            model = cls._from_dict_minimal(data)
+        else:
+            raise ValueError(f'Invalid parse mode: {parse_mode!r}')
+
+        model._raw = data
+        return model
+
+    def to_dict(self, **kwargs) -> dict:
+        if self._raw is not None:
+            # load the full response (as received), so no fields are missing
+            return asdict(type(self).from_dict(self._raw), **kwargs)
+
+        return asdict(self, **kwargs)
+
+    def to_json(self, *, encoder=json.dumps, **encoder_kwargs) -> str:
+        return encoder(self.to_dict(), **encoder_kwargs)
+
+
 @dataclass
-class DetectLabelsResp(JSONWizard):
+class DetectLabelsResp(_Response, JSONWizard):
     """
     Response from Rekognition DetectLabels API
 
@@ -144,6 +300,22 @@ class DetectLabelsResp(JSONWizard):
     # Technically provided in response, but we don't need this.
     # label_model_version: Union[float, str]
 
+    @classmethod
+    def _from_dict_lazy(cls, data: dict):
+        return cls(_LazyList(Label, _get(data, 'Labels', [])))
+
+    @classmethod
+    def _from_dict_minimal(cls, data: dict):
+        # only the 'Person' label is needed
+        for label in _get(data, 'Labels', []):
+            if _get(label, 'Name', '').lower() == 'person':
+                instances = [Instance(_get_box(i), _get(i, 'Confidence'))
+                             for i in _get(label, 'Instances', [])]
+                return cls([Label(_get(label, 'Name'), _get(label, 'Confidence'),
+                                  instances, [])])
+
+        return cls([])
+
     @cached_property
     def label_name_to_value(self) -> DictWithLowerStore[str, 'Label']:
         """
@@ -160,10 +332,9 @@ class DetectLabelsResp(JSONWizard):
         for `face` helps pinpoint a matching person.
 
         """
-        labels = self.label_name_to_value
-        person = labels.get('person')
+        person = self._person_label
 
-        if people := person.instances:
+        if person and (people := person.instances):
 
             # if there's only one person in the image
             if len(people) == 1:
@@ -172,34 +343,59 @@ class DetectLabelsResp(JSONWizard):
 
             # if there's multiple people in the image, find the
             # person instance which wraps the input face box
+            return self.match_person_box(face)
 
-            if face is None:
-                return None
+        return None
 
-            face_box = face.bounding_box
-            face_left = face_box.left
-            face_right = face_left + face_box.width
+    def match_person_box(self, face: FaceDetail | None) -> BoundingBox | None:
+        """
+        Get the bounding box for the instance of a 'Person' which wraps (i.e.
+        horizontally contains) the box for `face`, if there is one.
+        """
+        person = self._person_label
 
-            for person in people:
-                person_box = person.bounding_box
-                person_left = person_box.left
-                person_right = person_left + person_box.width
+        if face is None or not person:
+            return None
 
-                if person_left <= face_left and person_right >= face_right:
-                    return person_box
+        face_box = face.bounding_box
+        face_left = face_box.left
+        face_right = face_left + face_box.width
+
+        for instance in person.instances:
+            person_box = instance.bounding_box
+            person_left = person_box.left
+            person_right = person_left + person_box.width
+
+            if person_left <= face_left and person_right >= face_right:
+                return person_box
 
         return None
 
     @cached_property
     def person_boxes(self) -> list[BoundingBox] | None:
-        labels = self.label_name_to_value
-        person = labels.get('person')
+        person = self._person_label
 
-        if instances := person.instances:
+        if person and (instances := person.instances):
             return [i.bounding_box for i in instances]
 
         return None
 
+    @property
+    def _person_label(self) -> Label | None:
+        labels = self.labels
+
+        # find the label, without loading all the others
+        if isinstance(labels, _LazyList):
+            for i, label in enumerate(labels.raw):
+                if _get(label, 'Name', '').lower() == 'person':
+                    return labels[i]
+            return None
+
+        try:
+            return self.label_name_to_value.get('person')
+        except KeyError:  # no person is detected in the image
+            return None
+
 
 @dataclass
 class Label:
@@ -277,13 +473,23 @@ class UnmatchedFace:
 
 
 @dataclass
-class DetectFacesResp(JSONWizard):
+class DetectFacesResp(_Response, JSONWizard):
     """
     Response from the Rekognition DetectFaces API
 
     """
     face_details: List['FaceDetail']
 
+    @classmethod
+    def _from_dict_lazy(cls, data: dict):
+        return cls(_LazyList(FaceDetail, _get(data, 'FaceDetails', [])))
+
+    @classmethod
+    def _from_dict_minimal(cls, data: dict):
+        # only the bounding box (and confidence) of each face is needed
+        return cls([FaceDetail(_get_box(face), confidence=_get(face, 'Confidence'))
+                    for face in _get(data, 'FaceDetails', [])])
+
     def get_face(self) -> Optional['FaceDetail']:
         """
         Return the primary face that is detected, if available.
@@ -300,22 +506,26 @@ class FaceDetail:
     """
     FaceDetail dataclass
 
+    Only the bounding box and confidence are always present. The other
+    attributes depend on the `Attributes` requested from the DetectFaces
+    API, or are missing if the face is from a local detector.
+
     """
     bounding_box: 'BoundingBox'
-    age_range: 'AgeRange'
-    smile: 'Smile'
-    eyeglasses: 'Eyeglasses'
-    sunglasses: 'Sunglasses'
-    gender: 'Gender'
-    beard: 'Beard'
-    mustache: 'Mustache'
-    eyes_open: 'EyesOpen'
-    mouth_open: 'MouthOpen'
-    emotions: List['Emotion']
-    landmarks: List['Landmark']
-    pose: 'Pose'
-    quality: 'Quality'
-    confidence: float
+    age_range: Optional['AgeRange'] = None
+    smile: Optional['Smile'] = None
+    eyeglasses: Optional['Eyeglasses'] = None
+    sunglasses: Optional['Sunglasses'] = None
+    gender: Optional['Gender'] = None
+    beard: Optional['Beard'] = None
+    mustache: Optional['Mustache'] = None
+    eyes_open: Optional['EyesOpen'] = None
+    mouth_open: Optional['MouthOpen'] = None
+    emotions: List['Emotion'] = field(default_factory=list)
+    landmarks: List['Landmark'] = field(default_factory=list)
+    pose: Optional['Pose'] = None
+    quality: Optional['Quality'] = None
+    confidence: Optional[float] = None
 
     @cached_property
     def emotion_to_confidence(self) -> DictWithLowerStore[str, float]:
@@ -5,19 +5,28 @@ __all__ = ['FillColor',
            'draw_rectangle',
            'draw_box',
            'show_image',
-           'best_fit_coordinates']
-
+           'best_fit_coordinates',
+           'FacesFirst',
+           'FacesFirstStats',
+           'DEFAULT_FIT',
+           'DEFAULT_OFFSET']
+
+from collections import Counter
+from dataclasses import dataclass, field
 from enum import Enum
 from functools import cached_property
+from threading import Lock
 
 import cv2 as cv
 from PIL import Image, ImageDraw
 
-from .rekognition_models import BoundingBox, Landmark, Coordinates
+from .rekognition_models import BoundingBox, Coordinates, DetectFacesResp, Landmark
 from ...log import LOG
 
 
-_DEFAULT_OFFSET = 0.17
+# defaults for the parameters of `best_fit_coordinates`
+DEFAULT_FIT = 1 / 3.5
+DEFAULT_OFFSET = 0.17
 
 _SCREEN_WIDTH = _SCREEN_HEIGHT = None
 
@@ -92,11 +101,18 @@ def draw_circle(im, landmark: Landmark, color: FillColor = FillColor.YELLOW,
 
 
 def best_fit_coordinates(im, face_box: BoundingBox, *boxes: BoundingBox | None,
-                         fit=1/3.5,
-                         x_offset=_DEFAULT_OFFSET,
-                         y_offset=_DEFAULT_OFFSET,
+                         fit=DEFAULT_FIT,
+                         x_offset=DEFAULT_OFFSET,
+                         y_offset=DEFAULT_OFFSET,
                          constrain_width=True) -> Coordinates:
+    """
+    Get the X/Y coordinates to crop a headshot of the face in `face_box`,
+    constrained by any other bounding boxes (such as for the 'Person').
+
+    `im` is either an OpenCV image or its shape, as a ``(height, width)``
+    tuple -- only the dimensions of the image are needed here.
 
+    """
     # recall: reducing by `offset` will enlarge it
     f_top = face_box.top
     new_top = f_top - y_offset
@@ -154,6 +170,114 @@ def best_fit_coordinates(im, face_box: BoundingBox, *boxes: BoundingBox | None,
     return face_coords
 
 
+@dataclass
+class FacesFirstStats:
+    """Counters for the DetectLabels calls made (or skipped) in faces-first mode."""
+    calls: int = 0
+    skipped: int = 0
+    # number of DetectLabels calls made, for each reason
+    reasons: Counter = field(default_factory=Counter)
+
+    @property
+    def skip_rate(self) -> float:
+        total = self.calls + self.skipped
+        return self.skipped / total if total else 0.0
+
+
+@dataclass
+class FacesFirst:
+    """
+    Policy for the "faces-first" mode, where the DetectFaces API is called
+    first, and the DetectLabels API is only called when the geometry of the
+    face suggests that the box for the 'Person' could change the crop in
+    :func:`best_fit_coordinates`. This is a heuristic -- DetectLabels is
+    called when:
+
+      * multiple faces are detected, so the person must be matched to the face.
+      * the crop around the face is within `edge_margin` of the left or right
+        edge of the image, where the person box can constrain the width.
+      * the region above the crop is larger than `max_headroom`, as the person
+        (e.g. a hat, or raised hands) can extend the crop upwards.
+      * the person is likely wide enough (estimated as `person_width_ratio`
+        times the width of the face) to widen the crop.
+      * the person is likely narrower than the crop around the face, which
+        constrains the width of the crop.
+
+    The crop is approximate when DetectLabels is skipped: it's made without
+    the person box, and so it can differ from the crop with it, if the
+    person is much narrower or wider than `person_width_ratio` times the
+    width of the face. The default (3.25) is the low end of the ratios in
+    the example portraits, where the crops are the same.
+
+    Values are relative to the width or height of the image (0-1). A policy
+    can be shared between calls, to collect `stats` on skipped calls.
+    """
+    edge_margin: float = 0.05
+    max_headroom: float = 0.1
+    person_width_ratio: float = 3.25
+    stats: FacesFirstStats = field(default_factory=FacesFirstStats)
+
+    def __post_init__(self):
+        self._lock = Lock()
+
+    def labels_reason(self, faces: DetectFacesResp,
+                      fit=DEFAULT_FIT,
+                      x_offset=DEFAULT_OFFSET,
+                      y_offset=DEFAULT_OFFSET) -> str | None:
+        """
+        Return the reason that DetectLabels is needed for an image, or None if
+        it can be skipped. The result is recorded in `stats`.
+        """
+        reason = self._get_reason(faces, fit, x_offset, y_offset)
+
+        with self._lock:
+            if reason is None:
+                self.stats.skipped += 1
+            else:
+                self.stats.calls += 1
+                self.stats.reasons[reason] += 1
+
+        return reason
+
+    def _get_reason(self, faces, fit, x_offset, y_offset) -> str | None:
+        face = faces.get_face()
+
+        # no face to crop around - the person box won't help
+        if face is None:
+            return None
+
+        if len(faces.face_details) > 1:
+            return 'multiple_faces'
+
+        box = face.bounding_box
+        f_left, f_right = box.left, box.left + box.width
+
+        if (f_left - x_offset < self.edge_margin
+                or f_right + x_offset > 1 - self.edge_margin):
+            return 'near_edge'
+
+        if box.top - y_offset > self.max_headroom:
+            return 'headroom'
+
+        # how far the person (likely) extends past the face, on each side
+        extent = (self.person_width_ratio - 1) / 2 * box.width
+
+        # the crop is narrowed if the person doesn't extend past the face by
+        # `x_offset` (see `constrain_width` in `best_fit_coordinates`)
+        if extent < x_offset:
+            return 'narrow_person'
+
+        # the crop is widened if the person extends past the face by more
+        # than this, on both sides (see `needs_fit` in `best_fit_coordinates`)
+        min_extent = x_offset / (1 - fit)
+
+        if (min(extent, f_left) > min_extent
+                and min(extent, 1 - f_right) > min_extent):
+            return 'wide_person'
+
+        return None
+
+
 def draw_rectangle(im, coords_or_box: Coordinates | BoundingBox,
                    color: FillColor = FillColor.GREEN,
                    offset=0,
@@ -0,0 +1,290 @@
+"""
+Caches for Rekognition API responses.
+
+Responses are keyed by a hash of the image data -- or by the S3 bucket, key
+and ETag of the image -- along with the API name and request parameters.
+"""
+from __future__ import annotations
+
+__all__ = ['CacheStats',
+           'ResponseCache',
+           'DiskCache',
+           'SQLiteCache']
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from threading import RLock
+from time import time
+
+from ...log import LOG
+
+
+@dataclass
+class CacheStats:
+    """Counters for cache usage."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResponseCache(ABC):
+    """
+    Base class for a (thread-safe) cache of Rekognition API responses.
+
+    :param max_bytes: Maximum total size of cached responses, in bytes; the
+      least recently used responses are evicted once this is exceeded.
+    :param ttl: Time-to-live of a cached response, in seconds (optional)
+
+    Sub-classes implement the ``_load``, ``_store``, ``_delete``, ``_touch``
+    and ``_evict`` methods.
+    """
+
+    def __init__(self, max_bytes: int | None = None, ttl: float | None = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = RLock()
+
+    @staticmethod
+    def make_key(api: str, image_id: str, params: dict | None = None) -> str:
+        """
+        Build a cache key for a response, where `image_id` identifies the
+        image (see :meth:`image_id`) and `params` are the API parameters
+        (other than `Image`).
+        """
+        params = json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+        return sha256(f'{api}|{image_id}|{params}'.encode()).hexdigest()
+
+    @staticmethod
+    def image_id(bucket: str | None = None, key: str | None = None,
+                 etag: str | None = None, im_bytes: bytes | None = None) -> str:
+        """
+        Identify an image by a hash of its bytes, or otherwise by its location
+        in S3 (and ETag, so that a modified object is not a cache hit).
+        """
+        if bucket:
+            return f's3://{bucket}/{key}#{etag}'
+
+        return sha256(im_bytes).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """Return the cached response for `key`, or None on a cache miss."""
+        with self._lock:
+            entry = self._load(key)
+
+            if entry is not None:
+                stored_at, data = entry
+
+                if self.ttl is None or time() - stored_at < self.ttl:
+                    self.stats.hits += 1
+                    self._touch(key)
+                    return json.loads(data)
+
+                # response has expired
+                self._delete(key)
+
+            self.stats.misses += 1
+            return None
+
+    def set(self, key: str, resp: dict):
+        """Cache a response for `key`."""
+        data = json.dumps(resp, separators=(',', ':'))
+
+        with self._lock:
+            self._store(key, data, time())
+
+            if self.max_bytes is not None:
+                evicted = self._evict(self.max_bytes)
+                if evicted:
+                    LOG.debug('Evicted %d cached response(s)', evicted)
+                    self.stats.evictions += evicted
+
+    @abstractmethod
+    def clear(self):
+        """Remove all cached responses."""
+
+    @abstractmethod
+    def _load(self, key: str) -> tuple[float, str] | None:
+        """Return a two-element tuple of (stored_at, data) for `key`."""
+
+    @abstractmethod
+    def _store(self, key: str, data: str, stored_at: float):
+        """Store the response `data` for `key`."""
+
+    @abstractmethod
+    def _delete(self, key: str):
+        """Remove the cached response for `key` (if any)."""
+
+    @abstractmethod
+    def _touch(self, key: str):
+        """Mark a cached response as recently used."""
+
+    @abstractmethod
+    def _evict(self, max_bytes: int) -> int:
+        """
+        Evict the least recently used responses, until the total size is
+        within `max_bytes`. Return the number of responses evicted.
+        """
+
+
+class DiskCache(ResponseCache):
+    """
+    Cache responses as files under a local folder, with least recently used
+    (LRU) eviction based on the modified time of the files.
+    """
+
+    def __init__(self, folder: os.PathLike[str] | str,
+                 max_bytes: int | None = None, ttl: float | None = None):
+        super().__init__(max_bytes, ttl)
+
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        # key -> (size in bytes, last used)
+        self._entries: dict[str, tuple[int, float]] = {}
+        for path in self.folder.glob('*/*.json'):
+            st = path.stat()
+            self._entries[path.stem] = (st.st_size, st.st_mtime)
+
+        self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key: str) -> Path:
+        return self.folder / key[:2] / f'{key}.json'
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._delete(key)
+
+    def _load(self, key):
+        path = self._path(key)
+
+        try:
+            # the first line of the file is the time the response was stored
+            stored_at, data = path.read_text().split('\n', 1)
+
+            if key not in self._entries:
+                # stored by another instance (or process) since the folder
+                # was listed
+                st = path.stat()
+                self._entries[key] = (st.st_size, st.st_mtime)
+                self._total_bytes += st.st_size
+
+            return float(stored_at), data
+        except FileNotFoundError:
+            return None
+
+    def _store(self, key, data, stored_at):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f'{stored_at}\n{data}')
+
+        size = path.stat().st_size
+        old_size, _ = self._entries.get(key, (0, 0))
+        self._total_bytes += size - old_size
+        self._entries[key] = (size, stored_at)
+
+    def _delete(self, key):
+        self._path(key).unlink(missing_ok=True)
+
+        size, _ = self._entries.pop(key, (0, 0))
+        self._total_bytes -= size
+
+    def _touch(self, key):
+        now = time()
+        os.utime(self._path(key), (now, now))
+        self._entries[key] = (self._entries[key][0], now)
+
+    def _evict(self, max_bytes):
+        evicted = 0
+
+        if self._total_bytes > max_bytes:
+            lru_keys = sorted(self._entries, key=lambda k: self._entries[k][1])
+            for key in lru_keys:
+                if self._total_bytes <= max_bytes:
+                    break
+                self._delete(key)
+                evicted += 1
+
+        return evicted
+
+
+class SQLiteCache(ResponseCache):
+    """
+    Cache responses in a SQLite database, with least recently used (LRU)
+    eviction.
+    """
+
+    def __init__(self, path: os.PathLike[str] | str = ':memory:',
+                 max_bytes: int | None = None, ttl: float | None = None):
+        super().__init__(max_bytes, ttl)
+
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, '
+            'stored_at REAL NOT NULL, used_at REAL NOT NULL)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)')
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+
+    def _load(self, key):
+        return self._conn.execute(
+            'SELECT stored_at, data FROM responses WHERE key = ?', (key, )
+        ).fetchone()
+
+    def _store(self, key, data, stored_at):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+            (key, data, len(data), stored_at, stored_at))
+
+    def _delete(self, key):
+        self._conn.execute('DELETE FROM responses WHERE key = ?', (key, ))
+
+    def _touch(self, key):
+        self._conn.execute(
+            'UPDATE responses SET used_at = ? WHERE key = ?', (time(), key))
+
+    def _evict(self, max_bytes):
+        total_bytes = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+        if total_bytes <= max_bytes:
+            return 0
+
+        evict_keys = []
+        for key, size in self._conn.execute(
+                'SELECT key, size FROM responses ORDER BY used_at'):
+            if total_bytes <= max_bytes:
+                break
+            evict_keys.append((key, ))
+            total_bytes -= size
+
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', evict_keys)
+
+        return len(evict_keys)
@@ -1,47 +1,97 @@
 from __future__ import annotations
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, ClassVar, Optional
+
 from boto3 import Session, client
 from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from .client_cache import ClientCache
+from ..img_orient import HEADER_PROBE_SIZE, ImageHeader, probe_jpeg_header
 from ...log import LOG
 
 
+# objects larger than this are retrieved in parts, with parallel range requests
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# called with the header of an image, once the start of it is retrieved
+HeaderCallback = Callable[[Optional[ImageHeader]], None]
+
+
 class S3Helper(ClientCache):
     """
     Helper class for interacting with the `boto3` S3 client.
+
+    Objects larger than `part_size` are retrieved with parallel range
+    requests, up to `max_concurrency` at a time; pass a `part_size` of
+    ``0`` to always retrieve an object with a single request.
+
+    The parts are retrieved on a thread pool which is shared by all calls
+    (and threads) with the same `max_concurrency`, and the connection pool of
+    the client has `max_concurrency` connections on top of
+    `max_pool_connections` for them.
     """
 
     SERVICE_NAME = 's3'
 
+    # thread pools to retrieve the parts of objects, for each `max_concurrency`
+    _part_pools: ClassVar[dict[int, ThreadPoolExecutor]] = {}
+
     def __init__(self, region_name='us-east-1', profile_name=None,
                  access_key: str | None = None, secret_key: str | None = None,
                  use_sig_v4=False, init_client=False,
-                 max_pool_connections=None):
+                 max_pool_connections=None, endpoint_url: str | None = None,
+                 part_size: int = DEFAULT_PART_SIZE, max_concurrency: int = 8):
 
         self.access_key = access_key
         self.secret_key = secret_key
         self.use_sig_v4 = use_sig_v4
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
 
         super().__init__(region_name, profile_name, init_client,
-                         max_pool_connections=max_pool_connections)
+                         max_pool_connections=max_pool_connections,
+                         endpoint_url=endpoint_url)
 
     def _create_client(self):
-        client_kwargs = {}
-        config_kwargs = {}
-
         if self.THREAD_SAFE or self.profile_name:
             client_func = Session(profile_name=self.profile_name).client
         else:
             client_func = client
 
+        return client_func(self.SERVICE_NAME, self.region_name, **self._client_kwargs())
+
+    def _config_key(self) -> tuple:
+        return (*super()._config_key(), self.access_key, self.use_sig_v4,
+                self._part_connections())
+
+    def _part_connections(self) -> int:
+        """Connections in the pool of the client, to retrieve the parts of objects."""
+        return self.max_concurrency if self.part_size else 0
+
+    def _client_kwargs(self) -> dict:
+        client_kwargs = {}
+        config_kwargs = {}
+
         if self.access_key and self.secret_key:
             # Using access keys from an IAM user
             client_kwargs['aws_access_key_id'] = self.access_key
             client_kwargs['aws_secret_access_key'] = self.secret_key
 
-        if self.max_pool_connections:
+        if self.endpoint_url:
+            client_kwargs['endpoint_url'] = self.endpoint_url
+            # a custom endpoint (such as `localhost`) might not resolve
+            # bucket names as sub-domains
+            config_kwargs['s3'] = {'addressing_style': 'path'}
+
+        if part_connections := self._part_connections():
+            # on top of the `botocore` default of 10 connections
+            config_kwargs['max_pool_connections'] = \
+                (self.max_pool_connections or 10) + part_connections
+        elif self.max_pool_connections:
             config_kwargs['max_pool_connections'] = self.max_pool_connections
 
         if self.use_sig_v4:
@@ -52,18 +102,199 @@ class S3Helper(ClientCache):
         if config_kwargs:
             client_kwargs['config'] = Config(**config_kwargs)
 
-        return client_func(self.SERVICE_NAME, self.region_name, **client_kwargs)
+        return client_kwargs
 
-    def get_object_bytes(self, bucket, key) -> bytes:
+    def get_object_bytes(self, bucket, key,
+                         on_header: HeaderCallback | None = None,
+                         ) -> bytes | bytearray:
         """
         Retrieve an object (raw bytes) from S3.
+
+        A large object is retrieved in parts, which are read directly into a
+        preallocated buffer, and returned as a ``bytearray``; so there is no
+        second copy of the data, and it can be passed to ``np.frombuffer()``
+        as-is.
+
+        If `on_header` is passed in, it's called with the header of the
+        (JPEG) image -- its dimensions and EXIF orientation -- as soon as the
+        first part is retrieved, before the other parts. It's called with
+        None if the object is not a JPEG image.
+        """
+        try:
+            res = self.client.get_object(Bucket=bucket, Key=key,
+                                         **self._first_part_range())
+
+        except ClientError as ce:
+            # an empty object has no byte range to satisfy
+            if ce.response['Error']['Code'] == 'InvalidRange':
+                return b''
+            error_data = ce.response['Error']
+            LOG.error('Error retrieving object, error data: %s', str(error_data))
+            raise
+
+        size = _object_size(res)
+        if size <= self.part_size or not self.part_size:
+            data = res['Body'].read()
+            _probe_header(data, on_header)
+            return data
+
+        buf = bytearray(size)
+        view = memoryview(buf)
+        _read_into(res['Body'], view[:self.part_size])
+        _probe_header(view, on_header)
+
+        # retrieve the other parts, as long as the object is not modified
+        etag = res['ETag']
+        starts = range(self.part_size, size, self.part_size)
+
+        pool = self._part_pool()
+        for fut in [pool.submit(self._get_part, bucket, key, etag,
+                                view[start:start + self.part_size], start)
+                    for start in starts]:
+            fut.result()
+
+        LOG.debug('Retrieved object in %d parts, size=%d', len(starts) + 1, size)
+        return buf
+
+    def _part_pool(self) -> ThreadPoolExecutor:
+        """
+        The (shared) thread pool to retrieve the parts of objects, which caps
+        the range requests in flight at `max_concurrency` for the process.
+        """
+        try:
+            return self._part_pools[self.max_concurrency]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if (pool := self._part_pools.get(self.max_concurrency)) is None:
+                pool = self._part_pools[self.max_concurrency] = ThreadPoolExecutor(
+                    self.max_concurrency, thread_name_prefix='s3-part')
+
+        return pool
+
+    def _first_part_range(self) -> dict:
+        if not self.part_size:
+            return {}
+        return {'Range': f'bytes=0-{self.part_size - 1}'}
+
+    def _get_part(self, bucket, key, etag: str, view: memoryview, start: int):
+        """Read a part (byte range) of an object into `view`."""
+        res = self.client.get_object(
+            Bucket=bucket, Key=key, IfMatch=etag,
+            Range=f'bytes={start}-{start + len(view) - 1}',
+        )
+        _read_into(res['Body'], view)
+
+    def get_etag(self, bucket, key) -> str:
+        """
+        Retrieve the ETag of an object in S3, which changes whenever the
+        object is modified.
         """
         try:
-            res = self.client.get_object(Bucket=bucket, Key=key)
+            res = self.client.head_object(Bucket=bucket, Key=key)
 
         except ClientError as ce:
             error_data = ce.response['Error']
+            LOG.error('Error retrieving object metadata, error data: %s', str(error_data))
+            raise
+
+        return res['ETag']
+
+    async def get_object_bytes_async(self, bucket, key,
+                                     on_header: HeaderCallback | None = None,
+                                     ) -> bytes | bytearray:
+        """
+        Retrieve an object (raw bytes) from S3, without blocking the event
+        loop. Requires `aiobotocore` to be installed.
+        """
+        _client = await self.get_async_client()
+
+        try:
+            res = await _client.get_object(Bucket=bucket, Key=key,
+                                           **self._first_part_range())
+
+        except ClientError as ce:
+            # an empty object has no byte range to satisfy
+            if ce.response['Error']['Code'] == 'InvalidRange':
+                return b''
+            error_data = ce.response['Error']
             LOG.error('Error retrieving object, error data: %s', str(error_data))
             raise
 
-        return res['Body'].read()
+        size = _object_size(res)
+        if size <= self.part_size or not self.part_size:
+            async with res['Body'] as stream:
+                data = await stream.read()
+            _probe_header(data, on_header)
+            return data
+
+        buf = bytearray(size)
+        view = memoryview(buf)
+        async with res['Body'] as stream:
+            view[:self.part_size] = await stream.read()
+        _probe_header(view, on_header)
+
+        etag = res['ETag']
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def get_part(start: int):
+            async with semaphore:
+                part = await _client.get_object(
+                    Bucket=bucket, Key=key, IfMatch=etag,
+                    Range=f'bytes={start}-{min(start + self.part_size, size) - 1}',
+                )
+                async with part['Body'] as part_stream:
+                    view[start:start + self.part_size] = await part_stream.read()
+
+        await asyncio.gather(*[get_part(start)
+                               for start in range(self.part_size, size, self.part_size)])
+
+        return buf
+
+    async def get_etag_async(self, bucket, key) -> str:
+        """
+        Retrieve the ETag of an object in S3, without blocking the event
+        loop. Requires `aiobotocore` to be installed.
+        """
+        _client = await self.get_async_client()
+
+        try:
+            res = await _client.head_object(Bucket=bucket, Key=key)
+
+        except ClientError as ce:
+            error_data = ce.response['Error']
+            LOG.error('Error retrieving object metadata, error data: %s', str(error_data))
+            raise
+
+        return res['ETag']
+
+
+if hasattr(os, 'register_at_fork'):
+    # the threads of the pools are not copied to a child process
+    os.register_at_fork(after_in_child=S3Helper._part_pools.clear)
+
+
+def _probe_header(data, on_header: HeaderCallback | None):
+    """Pass the header of the image at the start of `data` to `on_header`."""
+    if on_header is not None:
+        on_header(probe_jpeg_header(data[:HEADER_PROBE_SIZE]))
+
+
+def _object_size(res: dict) -> int:
+    """Total size of an object, from a (ranged) GetObject response."""
+    if content_range := res.get('ContentRange'):
+        # e.g. `bytes 0-8388607/25165824`
+        return int(content_range.rpartition('/')[2])
+
+    return res['ContentLength']
+
+
+def _read_into(body, view: memoryview):
+    """Read a response `body` into `view`, until it is full."""
+    pos, end = 0, len(view)
+
+    while pos < end:
+        if not (n := body.readinto(view[pos:])):
+            raise IOError(f'Incomplete read of object part ({pos} of {end} bytes)')
+        pos += n
@@ -1,18 +1,40 @@
 from __future__ import annotations
 
+from hashlib import sha256
 from os.path import splitext
+from typing import Iterable
 
 import cv2 as cv
 import numpy as np
 
 from .aws.rekognition_models import DetectFacesResp, DetectLabelsResp
 from .aws.rekognition_utils import best_fit_coordinates, show_image
-from .img_orient import get_oriented_im_bytes, get_im_orientation
-from ..models import ProfilePhoto
+from .encoders import Encoding, encode_im
+from .img_orient import ImageHeader, get_im_header, get_oriented_im, get_oriented_shape
+from .lossless_crop import align_to_mcu, crop_jpeg, get_backend
+from ..errors import ImageMismatch, NoFaceDetected
+from ..log import LOG
+from ..models import CropPlan, ProfilePhoto, Timings
 
 
 _DEFAULT_FILE_EXT = '.jpg'
 
+# Flags to decode a (JPEG) image at a reduced resolution -- the image is
+# scaled down by the key, as part of the decoding process.
+_SCALE_TO_IMREAD_FLAG = {
+    1: cv.IMREAD_COLOR,
+    2: cv.IMREAD_REDUCED_COLOR_2,
+    4: cv.IMREAD_REDUCED_COLOR_4,
+    8: cv.IMREAD_REDUCED_COLOR_8,
+}
+
+_SCALE_TO_IMREAD_GRAYSCALE_FLAG = {
+    1: cv.IMREAD_GRAYSCALE,
+    2: cv.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
 
 def rotate_im_and_crop(fp: str,
                        faces: DetectFacesResp,
@@ -20,44 +42,443 @@ def rotate_im_and_crop(fp: str,
                        file_ext: str | None = None,
                        im_bytes: bytes = None,
                        debug: bool = False,
+                       max_size: tuple[int, int] | None = None,
+                       timings: Timings | None = None,
+                       renditions: Iterable[int] | None = None,
+                       encoding: Encoding | None = None,
+                       lossless: bool = False,
+                       header: ImageHeader | None = None,
                        ) -> ProfilePhoto:
+    """
+    Rotate (if needed) and crop an image to a headshot of the primary face.
+
+    If `renditions` is passed in, smaller versions of the photo are also
+    created, which fit within each size (in px) -- such as ``[64, 128, 256]``.
+    Each is resized from the next larger one, and encoded once.
+
+    The photo is encoded with the settings in `encoding` (optional), or
+    otherwise with the OpenCV defaults.
+
+    If `lossless` is passed in, a JPEG image is cropped without decoding it
+    (see :mod:`lossless_crop`), when it doesn't need to be rotated, resized
+    or re-encoded. The crop is aligned to the MCU grid, so it can be a few
+    pixels larger.
+
+    The `header` of the image can be passed in if it's already known, such
+    as for an image in S3 (see :meth:`S3Helper.get_object_bytes`).
+    """
 
     # Get primary face in the photo (might need to be tweaked?)
     face = faces.get_face()
+    if face is None:
+        raise NoFaceDetected(fp)
+
+    return _crop_faces(fp, [0], faces, labels, file_ext, im_bytes, debug,
+                       max_size, timings, renditions, encoding, lossless, header)[0]
+
+
+def rotate_im_and_crop_all(fp: str,
+                           faces: DetectFacesResp,
+                           labels: DetectLabelsResp | None,
+                           file_ext: str | None = None,
+                           im_bytes: bytes = None,
+                           debug: bool = False,
+                           max_size: tuple[int, int] | None = None,
+                           timings: Timings | None = None,
+                           renditions: Iterable[int] | None = None,
+                           encoding: Encoding | None = None,
+                           lossless: bool = False,
+                           header: ImageHeader | None = None,
+                           ) -> list[ProfilePhoto]:
+    """
+    Same as :func:`rotate_im_and_crop`, but creates a photo for each face
+    detected in the image, in the order of `faces.face_details`. The image
+    is only decoded once, and each face is cropped from the same array.
+    """
+    if not faces.face_details:
+        raise NoFaceDetected(fp)
+
+    return _crop_faces(fp, range(len(faces.face_details)), faces, labels,
+                       file_ext, im_bytes, debug, max_size, timings, renditions,
+                       encoding, lossless, header)
+
+
+def _crop_faces(fp: str,
+                face_indices: Iterable[int],
+                faces: DetectFacesResp,
+                labels: DetectLabelsResp | None,
+                file_ext: str | None,
+                im_bytes: bytes,
+                debug: bool,
+                max_size: tuple[int, int] | None,
+                timings: Timings | None,
+                renditions: Iterable[int] | None = None,
+                encoding: Encoding | None = None,
+                lossless: bool = False,
+                header: ImageHeader | None = None,
+                ) -> list[ProfilePhoto]:
+
+    if timings is None:
+        timings = Timings()
+
+    # from the largest size to the smallest, for the resize pyramid
+    rendition_sizes = sorted(set(renditions or ()), reverse=True)
+
+    face_indices = list(face_indices)
+
+    file_ext = _get_file_ext(fp, file_ext, encoding)
+
+    # Get Image Orientation, and the dimensions of the (raw) image. Note that
+    # this only reads the image header, and does not decode the image; the
+    # header of an image in S3 is already probed, as it's retrieved.
+    with timings.measure('orientation'):
+        if header is None:
+            header = get_im_header(im_bytes)
+        is_rotated, orientation = header.is_rotated, header.orientation
+        raw_shape = header.height, header.width
+
+    all_coords = []
+
+    with timings.measure('best_fit'):
+        for i in face_indices:
+            face = faces.face_details[i]
+            # Get bounding box for the Person in the photo. With multiple
+            # faces, only a person which wraps the face is a match.
+            person_box = (labels.get_person_box(face) if len(face_indices) == 1
+                          else labels.match_person_box(face))
+
+            # Get X/Y coordinates for cropping. Note that the bounding boxes from
+            # Rekognition are relative to the *oriented* image.
+            shape = get_oriented_shape(raw_shape, orientation) if is_rotated else raw_shape
+            all_coords.append(best_fit_coordinates(shape, face.bounding_box, person_box))
+
+    # Plans to render the crop again later (see `render_crop_plan`). The
+    # image data is only hashed if a plan is used (see `photo.crop_plan`).
+    plans = [CropPlan(None, orientation, coords, i)
+             for i, coords in zip(face_indices, all_coords)]
+
+    return _render_plans(fp, plans, header, faces, labels, file_ext, im_bytes, debug,
+                         max_size, timings, rendition_sizes, encoding, lossless)
 
+
+def render_crop_plan(plan: CropPlan,
+                     im_bytes: bytes,
+                     fp: str | None = None,
+                     file_ext: str | None = None,
+                     max_size: tuple[int, int] | None = None,
+                     timings: Timings | None = None,
+                     renditions: Iterable[int] | None = None,
+                     encoding: Encoding | None = None,
+                     lossless: bool = False,
+                     verify: bool = True,
+                     ) -> ProfilePhoto:
+    """
+    Render a headshot from the original image data, with a :class:`CropPlan`
+    from an earlier call to :func:`create_headshot` (see `photo.crop_plan`).
+
+    The image is cropped at the coordinates in the plan, so the Rekognition
+    API responses are not needed -- the `faces` and `labels` of the photo
+    are None. The other parameters are the same as for
+    :func:`rotate_im_and_crop`, so the photo can be rendered at another size
+    or in another format.
+
+    If `verify` is True (the default), the hash of `im_bytes` is checked
+    against the one in the plan (if any), and :class:`ImageMismatch` is
+    raised if they differ.
+    """
+    if timings is None:
+        timings = Timings()
+
+    file_ext = _get_file_ext(fp, file_ext, encoding)
+
+    with timings.measure('orientation'):
+        header = get_im_header(im_bytes)
+
+    if verify and plan.image_hash is not None:
+        with timings.measure('plan'):
+            image_hash = sha256(im_bytes).hexdigest()
+        if image_hash != plan.image_hash:
+            raise ImageMismatch(image_hash, plan.image_hash)
+
+    return _render_plans(fp, [plan], header, None, None, file_ext, im_bytes, False,
+                         max_size, timings, sorted(set(renditions or ()), reverse=True),
+                         encoding, lossless)[0]
+
+
+def _get_file_ext(fp: str | None, file_ext: str | None,
+                  encoding: Encoding | None) -> str:
     # Get file extension (.jpg etc.)
     if not file_ext:
         file_ext = splitext(fp)[1] if fp else _DEFAULT_FILE_EXT
 
-    # Get Image Orientation
-    _, is_rotated, orientation = get_im_orientation(im_bytes)
+    # the output format can differ from the input (e.g. `.webp`)
+    if encoding is not None:
+        file_ext = encoding.file_ext(file_ext)
+
+    return file_ext
+
+
+def _render_plans(fp: str | None,
+                  plans: list[CropPlan],
+                  header: ImageHeader,
+                  faces: DetectFacesResp | None,
+                  labels: DetectLabelsResp | None,
+                  file_ext: str,
+                  im_bytes: bytes,
+                  debug: bool,
+                  max_size: tuple[int, int] | None,
+                  timings: Timings,
+                  rendition_sizes: list[int],
+                  encoding: Encoding | None,
+                  lossless: bool,
+                  ) -> list[ProfilePhoto]:
+    """Crop (and rotate, resize and encode) a photo for each plan."""
+    is_rotated, orientation = header.is_rotated, header.orientation
+    raw_shape = header.height, header.width
+    all_coords = [plan.coordinates for plan in plans]
+
+    # Crop a JPEG image losslessly, without decoding it (if possible)
+    if lossless and _can_crop_losslessly(header, all_coords, file_ext, debug,
+                                         max_size, encoding):
+        return [
+            _crop_face_losslessly(fp, plan, header, faces, labels, file_ext,
+                                  im_bytes, timings, rendition_sizes, encoding)
+            for plan in plans
+        ]
+
+    # Decode the image at a reduced resolution, if the output only needs a
+    # fraction of the pixels (only supported for JPEG images). The largest
+    # crop, relative to the target size, decides the scale.
+    scale = 1
+    if max_size and header.format == 'JPEG':
+        scale = min(_get_decode_scale(coords, max_size) for coords in all_coords)
+
+    # Read in image data as OpenCV Image (decoded only once). The EXIF
+    # orientation is ignored here, as we correct it ourselves below.
+    with timings.measure('decode'):
+        img_as_np = np.frombuffer(im_bytes, dtype=np.uint8)
+        im = cv.imdecode(img_as_np,
+                         _SCALE_TO_IMREAD_FLAG[scale] | cv.IMREAD_IGNORE_ORIENTATION)
+
+    if scale > 1:
+        LOG.info('Decoded image at reduced resolution, scale=1/%d', scale)
+
+    photos = []
+
+    for plan in plans:
+        coords = plan.coordinates
+        # Map the coordinates back to the raw (un-oriented) image, so that only
+        # the cropped region needs to be rotated.
+        c = coords.unorient(orientation, raw_shape) if is_rotated else coords
+
+        if scale > 1:
+            c = c.scale(im.shape[1] / raw_shape[1], im.shape[0] / raw_shape[0])
+
+        with timings.measure('transform'):
+            # Crop the Photo
+            #   crop_img = img[y:y+h, x:x+w]
+            cropped_im = im[c.y1:c.y2, c.x1:c.x2]
+
+            # Correct Image Orientation (If Needed) - Rotate the Cropped Image
+            if is_rotated:
+                cropped_im = get_oriented_im(cropped_im, orientation)
+
+            # Resize the cropped photo to fit within the target size (if needed)
+            if max_size:
+                cropped_im = _resize_to_fit(cropped_im, max_size)
 
-    # Correct Image Orientation (If Needed) - Rotate Image
-    if is_rotated:
-        im_bytes = get_oriented_im_bytes(file_ext, im_bytes, orientation)[0]
+        # Show cropped image (if debug is enabled)
+        if debug:
+            show_image('Result', cropped_im)
+            cv.waitKey(0)
 
-    # Read in image data as OpenCV Image
-    img_as_np = np.frombuffer(im_bytes, dtype=np.uint8)
-    im = cv.imdecode(img_as_np, cv.IMREAD_COLOR)
+        # Convert the cropped photo to bytes
+        with timings.measure('encode'):
+            final_im_bytes: bytes = encode_im(cropped_im, file_ext, encoding)
 
-    # Get bounding box for the Person in the photo
-    person_box = labels.get_person_box(face)
+        photos.append(ProfilePhoto(
+            fp, final_im_bytes, is_rotated, orientation, faces, labels, im_bytes,
+            timings, face_index=plan.face_index, file_ext=file_ext, coordinates=coords,
+            _crop_plan=plan,
+            renditions=_get_renditions(cropped_im, rendition_sizes, file_ext, encoding,
+                                       timings),
+        ))
 
-    # Get X/Y coordinates for cropping
-    coords = best_fit_coordinates(im, face.bounding_box, person_box)
+    return photos
 
-    # Crop the Photo
-    #   crop_img = img[y:y+h, x:x+w]
-    cropped_im = im[coords.y1:coords.y2, coords.x1:coords.x2]
 
-    # Show cropped image (if debug is enabled)
-    if debug:
-        show_image('Result', cropped_im)
-        cv.waitKey(0)
+def _can_crop_losslessly(header: ImageHeader, all_coords: list, file_ext: str,
+                         debug: bool, max_size: tuple[int, int] | None,
+                         encoding: Encoding | None) -> bool:
+    """
+    True if the crop of a JPEG image can be done in the DCT domain -- i.e. the
+    output is a JPEG image, which doesn't need to be rotated, resized, or
+    encoded with other settings.
+    """
+    if (header.format != 'JPEG' or header.mcu_size is None or header.is_rotated
+            or file_ext.lower() not in ('.jpg', '.jpeg') or debug):
+        return False
 
-    # Convert the cropped photo to bytes
-    final_im_bytes: bytes = cv.imencode(file_ext, cropped_im)[1].tobytes()
+    if encoding is not None and not encoding.is_default:
+        return False
+
+    if max_size:
+        for c in all_coords:
+            c = align_to_mcu(c, header.mcu_size)
+            if _get_fit_ratio(c.x2 - c.x1, c.y2 - c.y1, max_size) < 1:
+                return False
+
+    if get_backend() is None:
+        LOG.info('No backend for a lossless crop, install `PyTurboJPEG` '
+                 'or `jpegtran`. Falling back to decode and encode.')
+        return False
+
+    return True
+
+
+def _crop_face_losslessly(fp, plan: CropPlan, header: ImageHeader, faces, labels,
+                          file_ext: str, im_bytes: bytes, timings: Timings,
+                          rendition_sizes: list[int],
+                          encoding: Encoding | None) -> ProfilePhoto:
+
+    coords = align_to_mcu(plan.coordinates, header.mcu_size)
+
+    with timings.measure('transform'):
+        final_im_bytes = crop_jpeg(im_bytes, coords)
+
+    # renditions are resized from the (much smaller) cropped image
+    renditions = {}
+    if rendition_sizes:
+        with timings.measure('decode'):
+            cropped_im = cv.imdecode(np.frombuffer(final_im_bytes, dtype=np.uint8),
+                                     cv.IMREAD_COLOR)
+        renditions = _get_renditions(cropped_im, rendition_sizes, file_ext, encoding,
+                                     timings)
 
     return ProfilePhoto(
-        fp, final_im_bytes, is_rotated, orientation, faces, labels, im_bytes,
+        fp, final_im_bytes, False, header.orientation, faces, labels, im_bytes,
+        timings, face_index=plan.face_index, file_ext=file_ext, coordinates=coords,
+        _crop_plan=plan, renditions=renditions,
     )
+
+
+def _get_renditions(im, sizes: list[int], file_ext: str, encoding: Encoding | None,
+                    timings: Timings) -> dict[int, bytes]:
+    """
+    Get smaller versions of the (cropped) OpenCV image `im` as encoded bytes,
+    for each of `sizes` in descending order. Each version is resized from
+    the previous one, rather than from the full crop.
+    """
+    renditions = {}
+
+    for size in sizes:
+        with timings.measure('transform'):
+            im = _resize_to_fit(im, (size, size))
+
+        with timings.measure('encode'):
+            renditions[size] = encode_im(im, file_ext, encoding)
+
+    return renditions
+
+
+def downscale_for_analysis(im_bytes: bytes, max_dim: int, quality=90) -> bytes:
+    """
+    Get a downscaled copy of an image (as JPEG bytes) to send to the
+    Rekognition API for analysis, where the width and height of the copy
+    are at most `max_dim` pixels.
+
+    Bounding boxes returned by Rekognition are relative (0-1) to the
+    *oriented* image, so orientation correction is applied to the copy; the
+    crop coordinates can then be applied to the full-resolution original.
+
+    If the image is already small enough, the original image data is
+    returned instead.
+    """
+    header = get_im_header(im_bytes)
+    width, height = header.width, header.height
+
+    if max(width, height) <= max_dim:
+        return im_bytes
+
+    im = decode_oriented_im(im_bytes, max_dim)
+
+    LOG.info('Downscaled image for analysis, size=%dx%d, new_size=%dx%d',
+             width, height, im.shape[1], im.shape[0])
+
+    return cv.imencode('.jpg', im, [cv.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def decode_oriented_im(im_bytes: bytes, max_dim: int | None = None,
+                       grayscale=False) -> np.ndarray:
+    """
+    Decode an image as an OpenCV image, with orientation correction applied.
+
+    If `max_dim` is passed in, the image is scaled down so that its width
+    and height are at most `max_dim` pixels; JPEG images are decoded at a
+    reduced resolution where possible.
+    """
+    header = get_im_header(im_bytes)
+    width, height = header.width, header.height
+
+    ratio = _get_fit_ratio(width, height, (max_dim, max_dim)) if max_dim else 1
+
+    # Decode the image at a reduced resolution (if possible)
+    scale = _get_scale_for_ratio(ratio) if header.format == 'JPEG' else 1
+    flags = (_SCALE_TO_IMREAD_GRAYSCALE_FLAG if grayscale else _SCALE_TO_IMREAD_FLAG)[scale]
+
+    im = cv.imdecode(np.frombuffer(im_bytes, dtype=np.uint8),
+                     flags | cv.IMREAD_IGNORE_ORIENTATION)
+
+    if max_dim:
+        im = _resize_to_fit(im, (max_dim, max_dim))
+
+    if header.is_rotated:
+        im = get_oriented_im(im, header.orientation)
+
+    return im
+
+
+def _get_fit_ratio(width: int, height: int, max_size: tuple[int, int]) -> float:
+    """
+    Get the ratio to scale an image of `width` x `height` by, so that it fits
+    within `max_size` -- as a ``(width, height)`` tuple. The image is never
+    scaled up.
+    """
+    max_w, max_h = max_size
+
+    return min(max_w / width, max_h / height, 1)
+
+
+def _get_decode_scale(coords, max_size: tuple[int, int]) -> int:
+    """
+    Get the largest factor an image can be scaled down by when decoding it,
+    such that the cropped region (at `coords`) still meets the target size.
+    """
+    ratio = _get_fit_ratio(coords.width, coords.height, max_size)
+
+    return _get_scale_for_ratio(ratio)
+
+
+def _get_scale_for_ratio(ratio: float) -> int:
+    """
+    Get the largest factor (supported by the decoder) to scale down an image
+    by, where `ratio` is the final scale of the image.
+    """
+    for scale in (8, 4, 2):
+        if scale * ratio <= 1:
+            return scale
+
+    return 1
+
+
+def _resize_to_fit(im, max_size: tuple[int, int]):
+    """Resize an OpenCV image to fit within `max_size` (if needed)."""
+    h, w = im.shape[:2]
+    ratio = _get_fit_ratio(w, h, max_size)
+
+    if ratio == 1:
+        return im
+
+    new_size = max(round(w * ratio), 1), max(round(h * ratio), 1)
+
+    return cv.resize(im, new_size, interpolation=cv.INTER_AREA)
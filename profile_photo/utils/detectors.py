@@ -0,0 +1,245 @@
+"""
+Detectors for a face and person in an image, which can be used in place of
+the AWS Rekognition APIs.
+
+Detectors return the same response models as Rekognition, so that the crop
+logic (see :func:`best_fit_coordinates`) works unchanged.
+"""
+from __future__ import annotations
+
+__all__ = ['Detector',
+           'OpenCVDetector']
+
+from abc import ABC, abstractmethod
+from os import PathLike, fspath
+from threading import local
+
+import cv2 as cv
+import numpy as np
+
+from .aws.rekognition_models import (BoundingBox, DetectFacesResp, DetectLabelsResp,
+                                     FaceDetail, Instance, Label, Landmark)
+from .create_headshot import decode_oriented_im
+from ..log import LOG
+
+
+class Detector(ABC):
+    """
+    Base class for a detector of faces and persons in an image.
+
+    The :class:`Rekognition` client has the same interface, and is used as
+    the detector by default.
+    """
+
+    # True if detection runs on the local machine, rather than with an API
+    # call. Local detectors need the image data, and their work is CPU-bound.
+    is_local = True
+
+    @abstractmethod
+    def detect_faces(self, bucket: str | None, key: str | None,
+                     im_bytes: bytes | None = None, debug=False) -> DetectFacesResp:
+        """Detect the faces in an image."""
+
+    @abstractmethod
+    def detect_labels(self, bucket: str | None, key: str | None,
+                      im_bytes: bytes | None = None, debug=False) -> DetectLabelsResp:
+        """Detect the labels (i.e. 'Person') in an image."""
+
+    def detect(self, im_bytes: bytes,
+               debug=False) -> tuple[DetectFacesResp, DetectLabelsResp]:
+        """Detect both the faces and labels (i.e. 'Person') in an image."""
+        return (self.detect_faces(None, None, im_bytes, debug),
+                self.detect_labels(None, None, im_bytes, debug))
+
+
+class OpenCVDetector(Detector):
+    """
+    Detect faces (and persons) with OpenCV, without any network calls.
+
+    By default, this uses the Haar cascades bundled with OpenCV. For better
+    accuracy, pass in `model_path` for a `YuNet`_ face detection model
+    (``.onnx``), which is run with :class:`cv2.FaceDetectorYN`. A path to
+    another Haar cascade (``.xml``) can also be passed in.
+
+    :param model_path: Path to a face detection model (optional)
+    :param max_dim: Images are scaled down so that the width and height are
+      at most this many pixels before detection, for speed
+    :param min_confidence: Minimum confidence (0-100) of a detected face;
+      note that for a Haar cascade, confidence is only approximate
+    :param detect_person: True to detect the upper body of a 'Person' (with
+      a Haar cascade), which constrains the crop like Rekognition does
+
+    .. _YuNet: https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+    """
+
+    # Haar cascade face boxes are square and tighter than the ones from
+    # Rekognition, which also include the forehead and chin. These factors
+    # (relative to the Haar box) approximate a box from Rekognition.
+    _HAAR_WIDTH_FACTOR = 0.78
+    _HAAR_HEIGHT_FACTOR = 1.12
+    _HAAR_TOP_SHIFT = 0.06
+
+    # landmarks detected by YuNet, in order
+    _YUNET_LANDMARKS = ('eyeRight', 'eyeLeft', 'nose', 'mouthRight', 'mouthLeft')
+
+    def __init__(self, model_path: PathLike[str] | str | None = None,
+                 max_dim: int = 1024,
+                 min_confidence: float | None = None,
+                 detect_person=True):
+
+        self.model_path = fspath(model_path) if model_path else None
+        self.max_dim = max_dim
+        self.detect_person = detect_person
+
+        self.is_yunet = bool(self.model_path) and self.model_path.endswith('.onnx')
+
+        if min_confidence is None:
+            min_confidence = 60 if self.is_yunet else 25
+        self.min_confidence = min_confidence
+
+        # models are not thread-safe, so they are created for each thread
+        self._models = local()
+
+    def __getstate__(self):
+        # models can't be pickled, i.e. for a worker process
+        state = self.__dict__.copy()
+        del state['_models']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._models = local()
+
+    def detect_faces(self, bucket, key, im_bytes=None, debug=False) -> DetectFacesResp:
+        return self.detect(im_bytes, debug)[0]
+
+    def detect_labels(self, bucket, key, im_bytes=None, debug=False) -> DetectLabelsResp:
+        return self.detect(im_bytes, debug)[1]
+
+    def detect(self, im_bytes: bytes,
+               debug=False) -> tuple[DetectFacesResp, DetectLabelsResp]:
+        # decode the image (once) for both faces and persons
+        im = decode_oriented_im(im_bytes, self.max_dim, grayscale=not self.is_yunet)
+        height, width = im.shape[:2]
+
+        if self.is_yunet:
+            face_details = self._detect_faces_yunet(im)
+        else:
+            face_details = self._detect_faces_haar(im)
+
+        # the primary face is the one with the highest confidence
+        face_details.sort(key=lambda f: f.confidence, reverse=True)
+
+        labels = []
+        if face_details:
+            instances = self._detect_persons(im, face_details) if self.detect_person else []
+            labels.append(Label('Person', face_details[0].confidence, instances, []))
+
+        if debug:
+            LOG.info('Detected %d face(s) and %d person(s), size=%dx%d',
+                     len(face_details), len(labels and labels[0].instances),
+                     width, height)
+
+        return DetectFacesResp(face_details), DetectLabelsResp(labels)
+
+    def _model(self, name: str, factory):
+        model = getattr(self._models, name, None)
+        if model is None:
+            model = factory()
+            setattr(self._models, name, model)
+
+        return model
+
+    def _cascade(self, filename: str) -> cv.CascadeClassifier:
+        path = self.model_path if filename is None else cv.data.haarcascades + filename
+        return self._model(f'cascade_{filename}', lambda: cv.CascadeClassifier(path))
+
+    def _detect_faces_haar(self, im: np.ndarray) -> list[FaceDetail]:
+        height, width = im.shape[:2]
+        cascade = self._cascade(None if self.model_path else 'haarcascade_frontalface_default.xml')
+
+        min_size = max(20, min(width, height) // 30)
+        boxes, _, weights = cascade.detectMultiScale3(
+            im, scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size),
+            outputRejectLevels=True)
+
+        face_details = []
+
+        for (x, y, w, h), weight in zip(boxes, weights):
+            # level weights are unbounded; scale them to be roughly 0-100
+            confidence = min(float(weight) * 10, 100.0)
+            if confidence < self.min_confidence:
+                continue
+
+            # approximate the (taller) box from Rekognition
+            new_w = w * self._HAAR_WIDTH_FACTOR
+            x += (w - new_w) / 2
+            y -= h * self._HAAR_TOP_SHIFT
+            h *= self._HAAR_HEIGHT_FACTOR
+
+            box = _to_box(x, y, new_w, h, width, height)
+            face_details.append(FaceDetail(box, confidence=confidence))
+
+        return face_details
+
+    def _detect_faces_yunet(self, im: np.ndarray) -> list[FaceDetail]:
+        height, width = im.shape[:2]
+        model = self._model('yunet', lambda: cv.FaceDetectorYN.create(
+            self.model_path, '', (width, height),
+            score_threshold=self.min_confidence / 100))
+
+        model.setInputSize((width, height))
+        _, faces = model.detect(im)
+
+        face_details = []
+
+        for face in (faces if faces is not None else ()):
+            x, y, w, h = face[:4]
+            landmarks = [
+                Landmark(name, float(face[i] / width), float(face[i + 1] / height))
+                for name, i in zip(self._YUNET_LANDMARKS, range(4, 14, 2))
+            ]
+            box = _to_box(x, y, w, h, width, height)
+            face_details.append(FaceDetail(box, landmarks=landmarks, confidence=float(face[14]) * 100))
+
+        return face_details
+
+    def _detect_persons(self, im: np.ndarray,
+                        face_details: list[FaceDetail]) -> list[Instance]:
+        """
+        Detect the upper body of persons in the image, which wrap a
+        detected face (horizontally).
+        """
+        height, width = im.shape[:2]
+        gray = im if im.ndim == 2 else cv.cvtColor(im, cv.COLOR_BGR2GRAY)
+
+        face_widths = [f.bounding_box.width * width for f in face_details]
+        min_size = round(min(face_widths) * 1.5)
+
+        cascade = self._cascade('haarcascade_upperbody.xml')
+        boxes = cascade.detectMultiScale(
+            gray, scaleFactor=1.05, minNeighbors=3, minSize=(min_size, min_size))
+
+        instances = []
+
+        for (x, y, w, h) in boxes:
+            box = _to_box(x, y, w, h, width, height)
+
+            for face in face_details:
+                face_box = face.bounding_box
+                if (box.left <= face_box.left
+                        and box.left + box.width >= face_box.left + face_box.width
+                        and box.top <= face_box.top):
+                    instances.append(Instance(box, face.confidence))
+                    break
+
+        return instances
+
+
+def _to_box(x, y, w, h, im_width, im_height) -> BoundingBox:
+    """Get a (relative) bounding box from pixel coordinates in an image."""
+    x1, y1 = max(float(x), 0), max(float(y), 0)
+    x2, y2 = min(float(x + w), im_width), min(float(y + h), im_height)
+
+    return BoundingBox(width=(x2 - x1) / im_width, height=(y2 - y1) / im_height,
+                       left=x1 / im_width, top=y1 / im_height)
@@ -89,6 +89,10 @@ class DictWithLowerStore(Dict[_KT, _VT]):
         for key in other:
             self[key] = other[key]
 
+    def __reduce__(self):
+        # the lower-cased key store needs to exist *before* any items are set
+        return self.__class__, (dict(self), )
+
     def copy(self):
         return DictWithLowerStore(self._lower_store.values())
 
@@ -0,0 +1,275 @@
+"""
+Encoders for the output image, with settings for the format, quality and
+compression effort.
+
+Usage::
+
+    >>> from profile_photo import create_headshot
+    >>> from profile_photo.utils.encoders import Encoding
+    >>> photo = create_headshot('/path/to/image.png',
+    >>>                         encoding=Encoding('webp', quality=80, encoder='fastest'))
+
+"""
+from __future__ import annotations
+
+__all__ = ['Encoding',
+           'EncoderName',
+           'encode_im']
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from io import BytesIO
+from time import perf_counter
+from typing import Literal
+
+import cv2 as cv
+import numpy as np
+from PIL import Image
+
+from ..log import LOG
+
+
+EncoderName = Literal['opencv', 'pillow', 'fastest']
+
+Subsampling = Literal['4:4:4', '4:2:2', '4:2:0']
+
+_EXT_TO_FORMAT = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.webp': 'webp',
+    '.avif': 'avif',
+}
+
+_FORMAT_TO_EXT = {
+    'jpeg': '.jpg',
+    'jpg': '.jpg',
+    'png': '.png',
+    'webp': '.webp',
+    'avif': '.avif',
+}
+
+_CV_SUBSAMPLING = {
+    '4:4:4': cv.IMWRITE_JPEG_SAMPLING_FACTOR_444,
+    '4:2:2': cv.IMWRITE_JPEG_SAMPLING_FACTOR_422,
+    '4:2:0': cv.IMWRITE_JPEG_SAMPLING_FACTOR_420,
+}
+
+# settings which are not passed in, for each format, so that both encoders
+# produce equivalent output: the OpenCV quality, and a fast zlib level
+_DEFAULTS = {
+    'jpeg': {'quality': 95},
+    'png': {'effort': 1},
+    'avif': {'quality': 95},
+}
+
+# number of times each encoder is run on a sample image, in `fastest` mode
+_CALIBRATION_RUNS = 3
+
+
+@dataclass(frozen=True)
+class Encoding:
+    """
+    Settings to encode the output image (and its renditions).
+
+    Settings which don't apply to the format are ignored, as are the ones
+    which the encoder doesn't support -- for example, OpenCV has no setting
+    for the compression effort of a WebP image.
+
+    :param format: Output format -- `jpeg`, `png`, `webp` or `avif` (optional),
+      defaults to the format of the output file extension
+    :param quality: Quality (0-100) for JPEG, WebP and AVIF images, which
+      defaults to 95 (as in OpenCV) with either encoder. WebP images are
+      lossless if not passed in.
+    :param progressive: True to write a progressive JPEG
+    :param optimize: True to compute optimal Huffman tables for a JPEG,
+      which makes it a few percent smaller
+    :param subsampling: Chroma subsampling for a JPEG (or an AVIF, with
+      Pillow), e.g. `4:2:0` for smaller images or `4:4:4` for sharper color
+    :param effort: Compression effort: the zlib level (0-9) for a PNG, the
+      method (0-6) for a WebP, or 10 minus the speed (0-10) for an AVIF.
+      Higher is smaller, but slower. A PNG defaults to ``effort=1``, which
+      is fast, with either encoder.
+    :param encoder: `opencv` (the default), `pillow`, or `fastest` to pick the
+      encoder which is faster for the format and settings, as measured once
+      per process on a sample image
+    """
+    format: str | None = None
+    quality: int | None = None
+    progressive: bool = False
+    optimize: bool = False
+    subsampling: Subsampling | None = None
+    effort: int | None = None
+    encoder: EncoderName = 'opencv'
+
+    @property
+    def is_default(self) -> bool:
+        """True if the encoder settings are the defaults (other than the format)."""
+        return replace(self, format=None, encoder='opencv') == Encoding()
+
+    def file_ext(self, default: str) -> str:
+        """The file extension for the output image, e.g. `.webp`."""
+        if self.format is None:
+            return default
+
+        try:
+            return _FORMAT_TO_EXT[self.format.lower()]
+        except KeyError:
+            raise ValueError(f'Unsupported output format: {self.format!r}') from None
+
+
+def encode_im(im: np.ndarray, file_ext: str, encoding: Encoding | None = None) -> bytes:
+    """
+    Encode an OpenCV image as `file_ext` (e.g. `.jpg`), with the settings in
+    `encoding` (optional). The OpenCV defaults are used if not passed in.
+    """
+    if encoding is None:
+        return cv.imencode(file_ext, im)[1].tobytes()
+
+    fmt = _EXT_TO_FORMAT.get(file_ext.lower())
+    encoding = _with_defaults(encoding, fmt)
+
+    encoder = encoding.encoder
+    if encoder == 'fastest':
+        encoder = _fastest_encoder(fmt, encoding)
+
+    if encoder == 'pillow':
+        return _encode_pillow(im, fmt, encoding)
+
+    if encoder == 'opencv':
+        return _encode_opencv(im, file_ext, fmt, encoding)
+
+    raise ValueError(f'Unknown encoder: {encoder!r}')
+
+
+def _with_defaults(encoding: Encoding, fmt: str | None) -> Encoding:
+    """Fill in the settings which are not passed in, for the format."""
+    defaults = {name: value for name, value in _DEFAULTS.get(fmt, {}).items()
+                if getattr(encoding, name) is None}
+
+    return replace(encoding, **defaults) if defaults else encoding
+
+
+def _encode_opencv(im, file_ext: str, fmt: str | None, encoding: Encoding) -> bytes:
+    params = []
+
+    if fmt == 'jpeg':
+        if encoding.quality is not None:
+            params += [cv.IMWRITE_JPEG_QUALITY, encoding.quality]
+        if encoding.progressive:
+            params += [cv.IMWRITE_JPEG_PROGRESSIVE, 1]
+        if encoding.optimize:
+            params += [cv.IMWRITE_JPEG_OPTIMIZE, 1]
+        if encoding.subsampling:
+            params += [cv.IMWRITE_JPEG_SAMPLING_FACTOR, _CV_SUBSAMPLING[encoding.subsampling]]
+
+    elif fmt == 'png':
+        if encoding.effort is not None:
+            params += [cv.IMWRITE_PNG_COMPRESSION, encoding.effort]
+
+    elif fmt == 'webp':
+        if encoding.quality is not None:
+            params += [cv.IMWRITE_WEBP_QUALITY, max(encoding.quality, 1)]
+
+    elif fmt == 'avif':
+        if encoding.quality is not None:
+            params += [cv.IMWRITE_AVIF_QUALITY, encoding.quality]
+        if encoding.effort is not None:
+            params += [cv.IMWRITE_AVIF_SPEED, 10 - encoding.effort]
+
+    return cv.imencode(file_ext, im, params)[1].tobytes()
+
+
+def _encode_pillow(im, fmt: str | None, encoding: Encoding) -> bytes:
+    if fmt is None:
+        raise ValueError('Only JPEG, PNG, WebP and AVIF images can be '
+                         'encoded with Pillow')
+
+    options = {}
+
+    if fmt == 'jpeg':
+        options.update(progressive=encoding.progressive, optimize=encoding.optimize)
+        if encoding.quality is not None:
+            options['quality'] = encoding.quality
+        if encoding.subsampling:
+            options['subsampling'] = encoding.subsampling
+
+    elif fmt == 'png':
+        options['optimize'] = encoding.optimize
+        if encoding.effort is not None:
+            options['compress_level'] = encoding.effort
+
+    elif fmt == 'webp':
+        if encoding.quality is None:
+            options['lossless'] = True
+        else:
+            options['quality'] = encoding.quality
+        if encoding.effort is not None:
+            options['method'] = encoding.effort
+
+    elif fmt == 'avif':
+        if encoding.quality is not None:
+            options['quality'] = encoding.quality
+        if encoding.effort is not None:
+            options['speed'] = 10 - encoding.effort
+        if encoding.subsampling:
+            options['subsampling'] = encoding.subsampling
+
+    # OpenCV images are BGR, while Pillow expects RGB
+    if im.ndim == 3:
+        im = cv.cvtColor(im, cv.COLOR_BGR2RGB)
+
+    out = BytesIO()
+    Image.fromarray(im).save(out, format=fmt.upper(), **options)
+
+    return out.getvalue()
+
+
+@lru_cache
+def _fastest_encoder(fmt: str | None, encoding: Encoding) -> str:
+    """
+    Return the encoder which is faster for the format and settings, timed on
+    a sample image. OpenCV is used if it's the only encoder for the format.
+    """
+    candidates = [name for name in ('opencv', 'pillow') if _can_write(name, fmt)]
+    if len(candidates) < 2:
+        return candidates[0] if candidates else 'opencv'
+
+    im = _sample_im()
+    ext = _FORMAT_TO_EXT[fmt]
+    times = {}
+
+    for name in candidates:
+        candidate = replace(encoding, encoder=name)
+        start = perf_counter()
+        for _ in range(_CALIBRATION_RUNS):
+            encode_im(im, ext, candidate)
+        times[name] = perf_counter() - start
+
+    fastest = min(times, key=times.get)
+    LOG.debug('Fastest encoder for %s: %s, times=%s', fmt, fastest, times)
+
+    return fastest
+
+
+def _can_write(encoder: str, fmt: str | None) -> bool:
+    if fmt is None:
+        return encoder == 'opencv'
+
+    if encoder == 'opencv':
+        return cv.haveImageWriter(_FORMAT_TO_EXT[fmt])
+
+    Image.init()
+    return fmt.upper() in Image.SAVE
+
+
+def _sample_im(size=256) -> np.ndarray:
+    """A sample image, with smooth gradients and some noise, like a photo."""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 200, size, dtype=np.float32)
+    im = np.stack([np.add.outer(gradient, gradient) / 2,
+                   np.add.outer(gradient, gradient[::-1]) / 2,
+                   np.add.outer(gradient[::-1], gradient) / 2], axis=-1)
+    im += rng.normal(0, 8, im.shape)
+
+    return np.clip(im, 0, 255).astype(np.uint8)
@@ -6,7 +6,7 @@ Ref: https://www.daveperrett.com/articles/2012/07/28/exif-orientation-handling-i
 """
 from __future__ import annotations
 
-from dataclasses import MISSING
+from dataclasses import MISSING, dataclass
 from io import BytesIO
 
 import cv2
@@ -41,73 +41,253 @@ def get_im_orientation(im_bytes: bytes,
     return im, bool(orientation and orientation != 1), orientation
 
 
-def get_oriented_im_bytes(file_ext: str,
-                          im_bytes: bytes = None,
-                          orientation: int | None | MISSING = MISSING) -> (bytes, bool):
+# number of bytes at the start of an image to probe for its header
+HEADER_PROBE_SIZE = 64 * 1024
+
+# JPEG "start of frame" markers, which hold the image dimensions
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# EXIF orientation tag
+_ORIENTATION_TAG = 0x0112
+
+
+@dataclass(frozen=True)
+class ImageHeader:
     """
-    Performs the same operation as `PIL.ImageOps.exif_transpose`_, but using
-    the OpenCV library.
+    Format, dimensions and EXIF orientation of an image, as stored in the
+    file (i.e. before the orientation is applied).
 
-    Returns a two-element tuple of (rotated_im_bytes, rotated). If an image
-    has an EXIF Orientation tag, return a new image (as bytes) that is
-    transposed accordingly. Otherwise, the `rotated` value will be false.
+    For a JPEG image, `mcu_size` is the ``(width, height)`` of the minimum
+    coded unit -- 8 or 16 px, depending on the chroma subsampling.
+    """
+    format: str | None
+    width: int
+    height: int
+    orientation: int | None
+    mcu_size: tuple[int, int] | None = None
+
+    @property
+    def is_rotated(self) -> bool:
+        return bool(self.orientation and self.orientation != 1)
 
-    .. _`PIL.ImageOps.exif_transpose`: https://pillow.readthedocs.io/en/latest/reference/ImageOps.html#PIL.ImageOps.exif_transpose
+
+def get_im_header(im_bytes: bytes) -> ImageHeader:
     """
-    _, is_rotated, orientation = get_im_orientation(im_bytes, orientation)
+    Get the header of an image. For a JPEG image, only the first bytes
+    (up to the start of frame) are parsed; otherwise, PIL reads the header.
+    """
+    header = probe_jpeg_header(memoryview(im_bytes)[:HEADER_PROBE_SIZE])
+
+    if header is None:
+        im = Image.open(BytesIO(im_bytes))
+        header = ImageHeader(im.format, im.width, im.height,
+                             im.getexif().get(_ORIENTATION_TAG))
+
+    return header
+
+
+def probe_jpeg_header(data: bytes) -> ImageHeader | None:
+    """
+    Parse the header of a JPEG image from the start of its data, such as the
+    first `HEADER_PROBE_SIZE` bytes -- without reading (or decoding) the
+    rest of the image.
+
+    The EXIF orientation is read from the APP1 segment, and the dimensions
+    from the start of frame. Returns None if `data` is not a JPEG image, or
+    if it ends before the start of frame.
+    """
+    if data[:2] != b'\xff\xd8':
+        return None
+
+    orientation = None
+    pos, end = 2, len(data)
+
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            return None
+
+        marker = data[pos + 1]
+        # fill bytes, and markers without a segment
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            pos += 2
+            continue
+        # start of scan, or end of image, without a start of frame
+        if marker in (0xDA, 0xD9):
+            return None
+
+        seg_len = int.from_bytes(data[pos + 2:pos + 4], 'big')
+
+        if marker == 0xE1 and orientation is None:
+            segment = data[pos + 4:pos + 2 + seg_len]
+            if segment[:6] == b'Exif\x00\x00':
+                orientation = _get_tiff_orientation(segment[6:])
+
+        elif marker in _JPEG_SOF_MARKERS:
+            num_components = data[pos + 9] if pos + 9 < end else 0
+            if pos + 10 + 3 * num_components > end:
+                return None
+            height = int.from_bytes(data[pos + 5:pos + 7], 'big')
+            width = int.from_bytes(data[pos + 7:pos + 9], 'big')
+            return ImageHeader('JPEG', width, height, orientation,
+                               _get_mcu_size(data[pos + 10:pos + 10 + 3 * num_components]))
+
+        pos += 2 + seg_len
+
+    return None
+
+
+def _get_mcu_size(components: bytes) -> tuple[int, int]:
+    """
+    Get the size of the minimum coded unit (MCU), from the components in the
+    start of frame -- each is 3 bytes, with the (horizontal and vertical)
+    sampling factors in the second byte.
+    """
+    # a grayscale image is not subsampled
+    if len(components) <= 3:
+        return 8, 8
+
+    factors = components[1::3]
+    return 8 * max(f >> 4 for f in factors), 8 * max(f & 0x0F for f in factors)
+
+
+def _get_tiff_orientation(tiff: bytes) -> int | None:
+    """Get the orientation tag in the first IFD of a TIFF (EXIF) header."""
+    if tiff[:2] == b'II':
+        byteorder = 'little'
+    elif tiff[:2] == b'MM':
+        byteorder = 'big'
+    else:
+        return None
+
+    def read_int(offset: int, size: int) -> int:
+        if offset + size > len(tiff):
+            raise IndexError(offset)
+        return int.from_bytes(tiff[offset:offset + size], byteorder)
+
+    try:
+        ifd = read_int(4, 4)
+        for i in range(read_int(ifd, 2)):
+            entry = ifd + 2 + 12 * i
+            if read_int(entry, 2) == _ORIENTATION_TAG:
+                # the value is a SHORT, in the first bytes of the value field
+                return read_int(entry + 8, 2)
+
+    except IndexError:  # truncated header
+        pass
+
+    return None
 
-    if not is_rotated:  # No orientation correction is needed on the image.
-        return im_bytes, False
 
-    def flip_left_right(im):
-        return cv2.flip(im, 1)
+def _flip_left_right(im):
+    return cv2.flip(im, 1)
 
-    def flip_top_bottom(im):
-        return cv2.flip(im, 0)
 
-    def rotate_180(im):
-        return cv2.rotate(im, cv2.ROTATE_180)
+def _flip_top_bottom(im):
+    return cv2.flip(im, 0)
 
-    def transpose(im):
-        return cv2.transpose(im)
 
-    def transverse(im):
-        return cv2.rotate(cv2.transpose(im), cv2.ROTATE_180)
+def _rotate_180(im):
+    return cv2.rotate(im, cv2.ROTATE_180)
 
-    def rotate_90(im):
-        return cv2.rotate(im, cv2.ROTATE_90_CLOCKWISE)
 
-    def rotate_90_cc(im):
-        return cv2.rotate(im, cv2.ROTATE_90_COUNTERCLOCKWISE)
+def _transpose(im):
+    return cv2.transpose(im)
 
-    method = {
-        2: flip_left_right,
-        3: rotate_180,
-        4: flip_top_bottom,
-        5: transpose,
-        6: rotate_90,
-        7: transverse,
-        8: rotate_90_cc,
-    }.get(orientation)
 
-    if method is not None:
-        LOG.info('Performing orientation correction, orientation=%d, method=%s',
-                 orientation, method.__name__)
+def _transverse(im):
+    return cv2.rotate(cv2.transpose(im), cv2.ROTATE_180)
 
-        # Read in original, un-oriented image (without the EXIF metadata)
-        im = cv2.imdecode(np.frombuffer(im_bytes, dtype=np.uint8),
-                          cv2.IMREAD_UNCHANGED)
 
-        # Perform orientation correction (transformation) on the image
-        im = method(im)
+def _rotate_90(im):
+    return cv2.rotate(im, cv2.ROTATE_90_CLOCKWISE)
+
+
+def _rotate_90_cc(im):
+    return cv2.rotate(im, cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+
+# Maps an EXIF orientation flag to the transform that corrects it
+_ORIENTATION_TO_METHOD = {
+    2: _flip_left_right,
+    3: _rotate_180,
+    4: _flip_top_bottom,
+    5: _transpose,
+    6: _rotate_90,
+    7: _transverse,
+    8: _rotate_90_cc,
+}
+
+
+def get_oriented_shape(shape: tuple[int, ...], orientation: int | None) -> tuple[int, ...]:
+    """
+    Get the shape of an image after orientation correction is applied,
+    given the `shape` of the raw (un-oriented) image.
+    """
+    # orientations 5-8 swap the width and height of an image
+    if orientation in (5, 6, 7, 8):
+        return (shape[1], shape[0], *shape[2:])
+
+    return shape
+
+
+def get_oriented_im(im: np.ndarray, orientation: int | None) -> np.ndarray:
+    """
+    Performs orientation correction on an (un-oriented) OpenCV image, which
+    is already decoded in memory.
+
+    Returns the transposed image, or the same image if the `orientation`
+    flag does not call for a correction.
+    """
+    method = _ORIENTATION_TO_METHOD.get(orientation)
+
+    if method is None:
+        return im
+
+    LOG.info('Performing orientation correction, orientation=%d, method=%s',
+             orientation, method.__name__.lstrip('_'))
+
+    return method(im)
+
+
+def get_oriented_im_bytes(file_ext: str,
+                          im_bytes: bytes = None,
+                          orientation: int | None | MISSING = MISSING) -> (bytes, bool):
+    """
+    Performs the same operation as `PIL.ImageOps.exif_transpose`_, but using
+    the OpenCV library.
+
+    Returns a two-element tuple of (rotated_im_bytes, rotated). If an image
+    has an EXIF Orientation tag, return a new image (as bytes) that is
+    transposed accordingly. Otherwise, the `rotated` value will be false.
+
+    Note: prefer :func:`get_oriented_im` when the image is to be further
+    processed, as this avoids a round trip of encoding to (and decoding
+    from) bytes.
+
+    .. _`PIL.ImageOps.exif_transpose`:
+       https://pillow.readthedocs.io/en/latest/reference/ImageOps.html#PIL.ImageOps.exif_transpose
+    """
+    _, is_rotated, orientation = get_im_orientation(im_bytes, orientation)
+
+    # No orientation correction is needed on the image.
+    if not is_rotated or orientation not in _ORIENTATION_TO_METHOD:
+        return im_bytes, False
+
+    # Read in original, un-oriented image (without the EXIF metadata)
+    im = cv2.imdecode(np.frombuffer(im_bytes, dtype=np.uint8),
+                      cv2.IMREAD_UNCHANGED)
 
-        # Convert an OpenCV image to bytes
-        # https://jdhao.github.io/2019/07/06/python_opencv_pil_image_to_bytes/
-        is_success, im_buf_arr = cv2.imencode(file_ext, im)
+    # Perform orientation correction (transformation) on the image
+    im = get_oriented_im(im, orientation)
 
-        return im_buf_arr.tobytes(), True
+    # Convert an OpenCV image to bytes
+    # https://jdhao.github.io/2019/07/06/python_opencv_pil_image_to_bytes/
+    is_success, im_buf_arr = cv2.imencode(file_ext, im)
 
-    return im_bytes, False
+    return im_buf_arr.tobytes(), True
 
 
 def resize_ims_and_concat_h(im1: PILImage, im2: PILImage,
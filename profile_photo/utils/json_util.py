@@ -1,27 +1,37 @@
 from __future__ import annotations
 
-from json import load
+from json import load, loads
 from pathlib import Path
 
 from dataclass_wizard.abstractions import W
 
+from .aws.rekognition_models import ParseMode
 from ..models import Params
 
 
-def load_to_model(model_cls: type[W], data: W | dict | str | Path, param: Params | str) -> W:
-    """Load `data` as an instance of a model class `model_cls`."""
+def load_to_model(model_cls: type[W], data: W | dict | str | Path, param: Params | str,
+                  parse_mode: ParseMode = 'full') -> W:
+    """
+    Load `data` as an instance of a model class `model_cls`.
+
+    A `parse_mode` other than `full` loads an API response lazily, or only
+    partially (see :meth:`DetectFacesResp.load`).
+    """
 
     if isinstance(data, model_cls):
         return data
 
-    if isinstance(data, dict):
-        return model_cls.from_dict(data)
-
     if isinstance(data, Path):
         with open(data) as in_file:
-            return model_cls.from_dict(load(in_file))
+            data = load(in_file)
 
-    if isinstance(data, str):
-        return model_cls.from_json(data)
+    elif isinstance(data, str):
+        data = loads(data)
+
+    elif not isinstance(data, dict):
+        raise ValueError(f'Invalid type ({type(data)}) for `{param}`') from None
+
+    if parse_mode == 'full':
+        return model_cls.from_dict(data)
 
-    raise ValueError(f'Invalid type ({type(data)}) for `{param}`') from None
+    return model_cls.load(data, parse_mode)
@@ -0,0 +1,94 @@
+"""
+Lossless crop of a JPEG image, in the DCT domain -- the way ``jpegtran
+-crop`` does -- so the pixels are not decoded and re-encoded.
+
+The left and top edges of the crop are aligned to the MCU grid (8 or 16 px),
+which can enlarge the crop by a few pixels. This needs either `PyTurboJPEG`_
+(and the libjpeg-turbo library), or the ``jpegtran`` command-line tool::
+
+    $ pip install profile-photo[lossless]
+
+.. _PyTurboJPEG: https://github.com/lilohuang/PyTurboJPEG
+"""
+from __future__ import annotations
+
+__all__ = ['LosslessBackend',
+           'align_to_mcu',
+           'crop_jpeg',
+           'get_backend']
+
+import subprocess
+from functools import lru_cache
+from shutil import which
+from typing import Literal
+
+from .aws.rekognition_models import Coordinates
+from ..log import LOG
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:  # pragma: no cover
+    TurboJPEG = None
+
+
+LosslessBackend = Literal['turbojpeg', 'jpegtran']
+
+
+def align_to_mcu(coords: Coordinates, mcu_size: tuple[int, int]) -> Coordinates:
+    """
+    Align the left and top edges of the crop `coords` to the MCU grid, by
+    moving them left and up. The right and bottom edges can be anywhere.
+    """
+    mcu_w, mcu_h = mcu_size
+
+    return Coordinates(coords.x1 - coords.x1 % mcu_w, coords.y1 - coords.y1 % mcu_h,
+                       coords.x2, coords.y2)
+
+
+def crop_jpeg(im_bytes: bytes, coords: Coordinates,
+              backend: LosslessBackend | None = None) -> bytes | None:
+    """
+    Crop a JPEG image losslessly at `coords`, which must be aligned to the
+    MCU grid (see :func:`align_to_mcu`). Metadata, such as EXIF, is not
+    copied to the output image.
+
+    Returns None if no backend is available.
+    """
+    if backend is None and (backend := get_backend()) is None:
+        return None
+
+    x, y = coords.x1, coords.y1
+    w, h = coords.x2 - x, coords.y2 - y
+
+    if backend == 'turbojpeg':
+        return _turbojpeg().crop(im_bytes, x, y, w, h, copynone=True)
+
+    if backend == 'jpegtran':
+        return subprocess.run(
+            ['jpegtran', '-crop', f'{w}x{h}+{x}+{y}', '-copy', 'none'],
+            input=bytes(im_bytes), capture_output=True, check=True,
+        ).stdout
+
+    raise ValueError(f'Unknown backend for a lossless crop: {backend!r}')
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> LosslessBackend | None:
+    """The backend for a lossless crop, or None if neither is available."""
+    if TurboJPEG is not None:
+        try:
+            _turbojpeg()
+            return 'turbojpeg'
+        except (OSError, RuntimeError) as e:
+            LOG.debug('libjpeg-turbo is not available: %s', e)
+
+    if which('jpegtran'):
+        return 'jpegtran'
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def _turbojpeg() -> TurboJPEG:
+    # loads the libjpeg-turbo library (once)
+    return TurboJPEG()
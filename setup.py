@@ -63,6 +63,7 @@ setup(
 ],
     test_suite='tests',
     tests_require=test_requirements,
-    extras_require={'all': 'boto3'},
+    extras_require={'all': 'boto3', 'async': 'aiobotocore[boto3]',
+                    'lossless': 'PyTurboJPEG'},
     zip_safe=False
 )
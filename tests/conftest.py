@@ -1,7 +1,14 @@
+import json
+from hashlib import sha256
+from io import BytesIO
 from pathlib import Path
 
+from PIL import Image
 from pytest import fixture
 
+from profile_photo.utils.aws.rekognition import Rekognition
+from profile_photo.utils.aws.rekognition_models import DetectFacesResp, DetectLabelsResp
+
 
 images = [
     'boy-1.jpg',
@@ -29,3 +36,86 @@ def responses(examples) -> Path:
     responses.mkdir(exist_ok=True)
 
     return responses
+
+
+@fixture(scope='session')
+def boy_kwargs(responses) -> dict:
+    """
+    Return the cached API responses for `boy-1.jpg`, as keyword arguments
+    to :func:`create_headshot`.
+    """
+    return dict(faces=responses / 'boy-1_DetectFaces.json',
+                labels=responses / 'boy-1_DetectLabels.json')
+
+
+# Transforms to *undo* an EXIF orientation flag, i.e. to get the raw (sensor)
+# pixels of an image that displays upright with the given orientation.
+_UNDO_ORIENTATION = {
+    2: [Image.FLIP_LEFT_RIGHT],
+    3: [Image.ROTATE_180],
+    4: [Image.FLIP_TOP_BOTTOM],
+    5: [Image.TRANSPOSE],
+    6: [Image.ROTATE_90],
+    7: [Image.TRANSVERSE],
+    8: [Image.ROTATE_270],
+}
+
+
+@fixture(scope='session')
+def rotated_im_bytes(examples):
+    """
+    Return a factory which creates a JPEG image (as bytes) with an EXIF
+    orientation flag, which displays the same as an image in `examples`.
+    """
+    def factory(image: str, orientation: int) -> bytes:
+        im = Image.open(examples / image).convert('RGB')
+        for method in _UNDO_ORIENTATION.get(orientation, ()):
+            im = im.transpose(method)
+
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+
+        buf = BytesIO()
+        im.save(buf, 'JPEG', quality=95, exif=exif)
+        return buf.getvalue()
+
+    return factory
+
+
+@fixture
+def fake_rekognition(monkeypatch, examples, responses):
+    """
+    Replace calls to the Rekognition API with the cached responses for
+    images in `examples`. Returns a list of the API calls made.
+    """
+    digest_to_stem = {
+        sha256((examples / image).read_bytes()).hexdigest(): Path(image).stem
+        for image in images
+    }
+    calls = []
+
+    def fake_api(model_cls, api):
+        def detect(_self, bucket, key, im_bytes, _debug=False, *_args,
+                   parse_mode='full', attributes=None):
+            stem = Path(key).stem if bucket else digest_to_stem[sha256(im_bytes).hexdigest()]
+            calls.append((api, stem))
+            data = json.loads((responses / f'{stem}_{api}.json').read_text())
+            return model_cls.load(data, 'minimal' if attributes == 'minimal' else parse_mode)
+
+        return detect
+
+    def fake_async_api(model_cls, api):
+        detect = fake_api(model_cls, api)
+
+        async def detect_async(*args, **kwargs):
+            return detect(*args, **kwargs)
+
+        return detect_async
+
+    for api, model_cls in (('DetectFaces', DetectFacesResp),
+                           ('DetectLabels', DetectLabelsResp)):
+        method = f'detect_{api[6:].lower()}'
+        monkeypatch.setattr(Rekognition, method, fake_api(model_cls, api))
+        monkeypatch.setattr(Rekognition, f'{method}_async', fake_async_api(model_cls, api))
+
+    return calls
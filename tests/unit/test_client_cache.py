@@ -0,0 +1,59 @@
+"""Unit Tests for the cache of `boto3` clients."""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from time import sleep
+
+import pytest
+
+from profile_photo.utils.aws.client_cache import ClientCache, pool_connections_for
+from profile_photo.utils.aws.rekognition import Rekognition
+from profile_photo.utils.aws.s3 import S3Helper
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Replace client creation with a (slow) fake, and return the clients created."""
+    created = []
+
+    def create_client(self):
+        sleep(0.01)
+        created.append(self)
+        return object()
+
+    monkeypatch.setattr(ClientCache, '_clients', {})
+    monkeypatch.setattr(Rekognition, '_create_client', create_client)
+    monkeypatch.setattr(S3Helper, '_create_client', create_client)
+
+    return created
+
+
+def test_client_is_created_once_for_concurrent_threads(created):
+    workers = 16
+    barrier = Barrier(workers)
+
+    def get_client(_):
+        barrier.wait()
+        return Rekognition().client
+
+    with ThreadPoolExecutor(workers) as pool:
+        clients = set(map(id, pool.map(get_client, range(workers))))
+
+    assert len(clients) == len(created) == 1
+
+
+def test_clients_are_keyed_by_service_region_profile_and_config(created):
+    client = Rekognition().client
+
+    assert Rekognition('US-EAST-1').client is client
+    assert Rekognition(profile_name='other').client is not client
+    assert Rekognition('us-west-2').client is not client
+    assert Rekognition(max_pool_connections=50).client is not client
+    assert S3Helper().client is not client
+    assert S3Helper(use_sig_v4=True).client is not S3Helper().client
+
+    assert len(created) == 6
+
+
+@pytest.mark.parametrize('concurrency, expected', [(1, 10), (10, 10), (11, 20), (64, 70)])
+def test_pool_connections_for(concurrency, expected):
+    assert pool_connections_for(concurrency) == expected
@@ -0,0 +1,73 @@
+"""Unit Tests for the executors of I/O and CPU tasks."""
+import os
+import threading
+
+import pytest
+
+from profile_photo import create_headshot, create_headshots
+from profile_photo.executors import Executors
+from ..conftest import images
+
+
+def test_executors_shutdown(examples, fake_rekognition):
+    with Executors(io_workers=4, cpu_workers=2) as executors:
+        assert executors.max_pool_connections == 10
+
+        photo = create_headshot(examples / images[0], executors=executors)
+        assert photo.image.size
+
+        io_pool = executors.io
+        results = list(create_headshots([examples / image for image in images[:3]],
+                                        executors=executors))
+        assert all(r.ok for r in results)
+
+        # pools that are passed in are not shut down
+        assert executors.io is io_pool
+        assert executors.io.submit(sum, [1, 2]).result() == 3
+
+    assert executors._io is executors._cpu is None
+    with pytest.raises(RuntimeError):
+        io_pool.submit(sum, [1, 2])
+
+
+@pytest.mark.parametrize('py38', [False, True])
+def test_executors_shutdown_cancels_futures(monkeypatch, py38):
+    if py38:
+        monkeypatch.setattr('profile_photo.executors.sys.version_info', (3, 8))
+
+    executors = Executors(io_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    running = executors.io.submit(block)
+    started.wait(5)
+    queued = [executors.io.submit(sum, [1, 2]) for _ in range(3)]
+
+    executors.shutdown(wait=False, cancel_futures=True)
+    release.set()
+
+    assert running.result(5) is None
+    assert all(fut.cancelled() for fut in queued)
+
+
+def test_default_executors():
+    assert Executors.default() is Executors.default()
+    assert Executors.default().io_workers == 16
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_executors_reset_after_fork():
+    executors = Executors(io_workers=2)
+    assert executors.io.submit(sum, [1, 2]).result() == 3
+
+    if (pid := os.fork()) == 0:  # child process
+        ok = executors._io is None and executors.io.submit(sum, [3, 4]).result() == 7
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+    executors.shutdown()
@@ -0,0 +1,161 @@
+"""Unit Tests for the local stand-in server for the Rekognition and S3 APIs."""
+import asyncio
+import json
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pytest
+
+from profile_photo import create_headshot
+from profile_photo.utils.aws.local_server import LocalAWSServer
+from profile_photo.utils.aws.s3 import S3Helper
+
+
+@pytest.fixture
+def local_server(monkeypatch, examples, responses):
+    # credentials are needed to sign requests, but are not checked
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    with LocalAWSServer(responses, examples) as server:
+        yield server
+
+
+def test_create_headshot_with_local_server(examples, local_server):
+    endpoint_url = local_server.endpoint_url
+
+    photo = create_headshot(bucket='examples', key='boy-1.jpg', endpoint_url=endpoint_url)
+    expected = create_headshot((examples / 'boy-1.jpg').read_bytes(), endpoint_url=endpoint_url)
+
+    assert photo.image.size == expected.image.size
+    assert photo.faces == expected.faces
+    assert local_server.stats == {'GetObject': 1, 'DetectFaces': 2, 'DetectLabels': 2}
+
+
+def test_local_server_s3_range_and_missing_key(examples, local_server):
+    s3 = S3Helper(endpoint_url=local_server.endpoint_url)
+
+    resp = s3.client.get_object(Bucket='examples', Key='boy-1.jpg', Range='bytes=0-99')
+    assert resp['Body'].read() == (examples / 'boy-1.jpg').read_bytes()[:100]
+
+    with pytest.raises(s3.client.exceptions.NoSuchKey):
+        s3.get_object_bytes('examples', 'missing.jpg')
+
+
+def test_local_server_s3_key_outside_objects_dir(examples, local_server):
+    # `setup.py` is in the parent folder of `examples`
+    assert (examples.parent / 'setup.py').is_file()
+
+    for path in ('/examples/../setup.py', '/examples/..%2Fsetup.py', '/..%2F..%2Fsetup.py'):
+        with pytest.raises(HTTPError) as e:
+            urlopen(local_server.endpoint_url + path)
+        assert e.value.code == 404
+
+
+def test_local_server_throttling(local_server):
+    local_server.throttle_rate = 1
+
+    request = Request(local_server.endpoint_url, data=b'{}', headers={
+        'X-Amz-Target': 'RekognitionService.DetectFaces',
+        'Content-Type': 'application/x-amz-json-1.1',
+    })
+
+    with pytest.raises(HTTPError) as e:
+        urlopen(request)
+
+    assert e.value.code == 400
+    assert json.loads(e.value.read())['__type'] == 'ThrottlingException'
+    assert local_server.stats['throttled'] == 1
+
+
+@pytest.mark.parametrize('size', [0, 1000, 2_500_000])
+def test_s3_get_object_in_parts(monkeypatch, responses, tmp_path, size):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    data = np.random.default_rng(0).bytes(size)
+    (tmp_path / 'large.bin').write_bytes(data)
+
+    with LocalAWSServer(responses, tmp_path) as server:
+        s3 = S3Helper(endpoint_url=server.endpoint_url, part_size=1_000_000)
+        assert s3.get_object_bytes('bucket', 'large.bin') == data
+        assert asyncio.run(_get_object_bytes_async(s3, 'bucket', 'large.bin')) == data
+
+    # the object is retrieved in parts of 1 MB (at least one)
+    parts = max(-(-size // 1_000_000), 1)
+    assert server.stats['GetObject'] == 2 * parts
+
+
+def test_s3_parts_share_a_pool(monkeypatch, responses, tmp_path):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    data = np.random.default_rng(0).bytes(2_500_000)
+    (tmp_path / 'large.bin').write_bytes(data)
+
+    with LocalAWSServer(responses, tmp_path) as server:
+        s3 = S3Helper(endpoint_url=server.endpoint_url, part_size=1_000_000,
+                      max_pool_connections=20, max_concurrency=4)
+        assert s3.get_object_bytes('bucket', 'large.bin') == data
+        pool = s3._part_pool()
+        assert s3.get_object_bytes('bucket', 'large.bin') == data
+
+    assert s3._part_pool() is pool
+    assert pool._max_workers == 4
+    # the connections for the parts are on top of `max_pool_connections`
+    assert s3.client.meta.config.max_pool_connections == 24
+
+
+def test_create_headshot_from_large_s3_object(examples, local_server):
+    s3 = S3Helper(endpoint_url=local_server.endpoint_url, part_size=16 * 1024)
+
+    im_bytes = s3.get_object_bytes('examples', 'woman-2.jpeg')
+    assert isinstance(im_bytes, bytearray)
+
+    photo = create_headshot(im_bytes, key='woman-2.jpeg',
+                            endpoint_url=local_server.endpoint_url)
+    expected = create_headshot(examples / 'woman-2.jpeg',
+                               endpoint_url=local_server.endpoint_url)
+
+    assert photo.im_bytes == expected.im_bytes
+
+
+async def _get_object_bytes_async(s3, bucket, key):
+    try:
+        return await s3.get_object_bytes_async(bucket, key)
+    finally:
+        await S3Helper.close_async_clients()
+
+
+@pytest.mark.parametrize('part_size', [16 * 1024, 0])
+def test_s3_get_object_reports_header(examples, local_server, part_size):
+    s3 = S3Helper(endpoint_url=local_server.endpoint_url, part_size=part_size)
+    headers = []
+
+    # the header is known after the first part, before the others
+    def on_header(header):
+        headers.append((header, local_server.stats['GetObject']))
+
+    s3.get_object_bytes('examples', 'wonder-woman-1.jpeg', on_header=on_header)
+    s3.get_object_bytes('examples', 'woman-1.png', on_header=on_header)
+
+    (header, requests), (png_header, _) = headers
+    assert (header.width, header.height, header.orientation) == (1400, 787, 1)
+    assert requests == 1
+    assert png_header is None
+
+
+def test_create_headshot_uses_header_from_s3(monkeypatch, examples, local_server):
+    endpoint_url = local_server.endpoint_url
+    expected = create_headshot(bucket='examples', key='boy-1.jpg', endpoint_url=endpoint_url)
+
+    # the image data is not parsed again for its header
+    def get_im_header(_im_bytes):
+        raise AssertionError('header is parsed again')
+
+    monkeypatch.setattr('profile_photo.utils.create_headshot.get_im_header', get_im_header)
+
+    photo = create_headshot(bucket='examples', key='boy-1.jpg', endpoint_url=endpoint_url)
+
+    assert photo.im_bytes == expected.im_bytes
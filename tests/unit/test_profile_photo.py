@@ -1,11 +1,32 @@
 """Unit Tests for `profile_photo` package."""
+import asyncio
+import json
+from io import BytesIO
+from multiprocessing.shared_memory import SharedMemory
 from os import getenv
 
 import pytest
+import cv2 as cv
+import numpy as np
 from dataclass_wizard.utils.type_conv import as_bool
+from PIL import Image
 
-from profile_photo import create_headshot
-from profile_photo.errors import MissingParams
+from profile_photo import create_headshot, create_headshot_async, create_headshots, main
+from profile_photo.errors import ImageMismatch, MissingParams, NoFaceDetected
+from profile_photo.models import CropPlan
+from profile_photo.utils.aws.rekognition import Rekognition
+from profile_photo.utils.aws.rekognition_models import (
+    BoundingBox, Coordinates, DetectFacesResp, DetectLabelsResp, FaceDetail,
+)
+from profile_photo.utils.aws.rekognition_utils import FacesFirst, best_fit_coordinates
+from profile_photo.utils.create_headshot import render_crop_plan
+from profile_photo.utils.detectors import Detector, OpenCVDetector
+from profile_photo.utils.encoders import Encoding, encode_im
+from profile_photo.utils.img_orient import (
+    HEADER_PROBE_SIZE, ImageHeader, get_im_header, get_oriented_im, probe_jpeg_header,
+)
+from profile_photo.utils.json_util import load_to_model
+from profile_photo.utils.lossless_crop import align_to_mcu, get_backend
 from ..conftest import images
 
 
@@ -29,3 +50,580 @@ def test_create_headshot_and_show_result(examples, responses, image):
         labels=responses / f'{filepath.stem}_DetectLabels.json',
         debug=DEBUG,
     )
+
+
+@pytest.mark.parametrize('orientation', [3, 6, 8])
+def test_create_headshot_with_exif_orientation(examples, responses, rotated_im_bytes, orientation):
+    image = 'boy-1.jpg'
+    filepath = examples / image
+
+    kwargs = dict(
+        faces=responses / f'{filepath.stem}_DetectFaces.json',
+        labels=responses / f'{filepath.stem}_DetectLabels.json',
+    )
+
+    expected = create_headshot(filepath, **kwargs)
+    photo = create_headshot(rotated_im_bytes(image, orientation), **kwargs)
+
+    assert photo.is_rotated
+    assert photo.orientation == orientation
+    assert photo.image.size == expected.image.size
+    assert photo.original_image.size == expected.original_image.size
+
+    # allow for minor differences, due to JPEG re-encoding
+    diff = np.asarray(photo.image, dtype=int) - np.asarray(expected.image, dtype=int)
+    assert np.abs(diff).mean() < 5
+
+
+@pytest.mark.parametrize('orientation', range(1, 9))
+def test_coordinates_unorient(orientation):
+    raw_im = np.random.default_rng(orientation).integers(
+        0, 256, (60, 80, 3), dtype=np.uint8)
+    oriented_im = get_oriented_im(raw_im, orientation)
+
+    c = Coordinates(5, 10, 37, 51)
+    expected = oriented_im[c.y1:c.y2, c.x1:c.x2]
+
+    r = c.unorient(orientation, raw_im.shape)
+    cropped_im = get_oriented_im(raw_im[r.y1:r.y2, r.x1:r.x2], orientation)
+
+    assert np.array_equal(cropped_im, expected)
+
+
+@pytest.mark.parametrize('image', images)
+def test_create_headshot_with_max_size(examples, responses, image):
+    filepath = examples / image
+    max_size = (64, 80)
+
+    kwargs = dict(
+        faces=responses / f'{filepath.stem}_DetectFaces.json',
+        labels=responses / f'{filepath.stem}_DetectLabels.json',
+    )
+
+    full = create_headshot(filepath, **kwargs)
+    photo = create_headshot(filepath, max_size=max_size, **kwargs)
+
+    w, h = photo.image.size
+    assert w <= max_size[0] and h <= max_size[1]
+    # the output image meets the target size in at least one dimension
+    assert w >= max_size[0] - 1 or h >= max_size[1] - 1
+    # the aspect ratio of the crop is retained
+    full_w, full_h = full.image.size
+    assert w / h == pytest.approx(full_w / full_h, rel=0.05)
+
+
+def test_create_headshot_with_renditions(examples, boy_kwargs, tmp_path):
+    filepath = examples / 'boy-1.jpg'
+    sizes = [32, 64, 128, 256, 512]
+
+    expected = create_headshot(filepath, **boy_kwargs)
+    photo = create_headshot(filepath, renditions=sizes, output_dir=tmp_path, **boy_kwargs)
+
+    # the output image is the same as without renditions
+    assert photo.im_bytes == expected.im_bytes
+    assert list(photo.renditions) == sorted(sizes, reverse=True)
+
+    full_size = max(photo.image.size)
+    for size, im_bytes in photo.renditions.items():
+        im = cv.imdecode(np.frombuffer(im_bytes, np.uint8), cv.IMREAD_COLOR)
+        assert max(im.shape[:2]) == min(size, full_size)
+
+    assert (tmp_path / 'boy-1-32px-out.jpg').read_bytes() == photo.renditions[32]
+
+
+@pytest.mark.parametrize('encoding,ext', [
+    (Encoding(quality=50, progressive=True, optimize=True, subsampling='4:2:0'), '.jpg'),
+    (Encoding('png', effort=1, encoder='pillow'), '.png'),
+    (Encoding('webp', quality=80, encoder='fastest'), '.webp'),
+])
+def test_create_headshot_with_encoding(examples, boy_kwargs, tmp_path, encoding, ext):
+    filepath = examples / 'boy-1.jpg'
+
+    expected = create_headshot(filepath, **boy_kwargs)
+    photo = create_headshot(filepath, encoding=encoding, renditions=[64],
+                            output_dir=tmp_path, **boy_kwargs)
+
+    assert photo.image.format == ext[1:].replace('jpg', 'jpeg').upper()
+    assert photo.image.size == expected.image.size
+    assert Image.open(BytesIO(photo.renditions[64])).format == photo.image.format
+    assert (tmp_path / f'boy-1-out{ext}').read_bytes() == photo.im_bytes
+
+
+@pytest.mark.parametrize('ext', ['.jpg', '.png', '.webp'])
+def test_encoders_use_the_same_defaults(examples, ext):
+    im = cv.imread(str(examples / 'boy-1.jpg'))
+
+    # so `encoder='fastest'` doesn't change the quality (or size) of the image
+    opencv, pillow = (len(encode_im(im, ext, Encoding(encoder=encoder)))
+                      for encoder in ('opencv', 'pillow'))
+
+    assert pillow == pytest.approx(opencv, rel=0.05)
+
+
+def test_align_to_mcu():
+    coords = Coordinates(17, 30, 250, 301)
+
+    assert align_to_mcu(coords, (16, 16)) == Coordinates(16, 16, 250, 301)
+    assert align_to_mcu(coords, (8, 8)) == Coordinates(16, 24, 250, 301)
+
+
+def test_create_headshot_lossless_falls_back(monkeypatch, examples, boy_kwargs):
+    monkeypatch.setattr('profile_photo.utils.create_headshot.get_backend', lambda: None)
+
+    filepath = examples / 'boy-1.jpg'
+
+    photo = create_headshot(filepath, lossless=True, **boy_kwargs)
+
+    assert photo.im_bytes == create_headshot(filepath, **boy_kwargs).im_bytes
+
+
+@pytest.mark.skipif(get_backend() is None, reason='needs PyTurboJPEG or jpegtran')
+def test_create_headshot_lossless(examples, boy_kwargs):
+    filepath = examples / 'boy-1.jpg'
+
+    photo = create_headshot(filepath, lossless=True, renditions=[64], **boy_kwargs)
+
+    assert 64 in photo.renditions
+
+    # the crop is aligned to the MCU grid (8 px for this image), and the
+    # pixels are the same as in the original image
+    faces = load_to_model(DetectFacesResp, boy_kwargs['faces'], 'faces')
+    labels = load_to_model(DetectLabelsResp, boy_kwargs['labels'], 'labels')
+    face = faces.get_face()
+
+    im = cv.imread(str(filepath))
+    c = align_to_mcu(best_fit_coordinates(im, face.bounding_box,
+                                          labels.get_person_box(face)), (8, 8))
+    cropped = cv.imdecode(np.frombuffer(photo.im_bytes, np.uint8), cv.IMREAD_COLOR)
+
+    assert photo.coordinates == c
+    assert np.array_equal(cropped, im[c.y1:c.y2, c.x1:c.x2])
+
+
+def test_create_headshot_lossless_crops_at_mcu(monkeypatch, examples, boy_kwargs):
+    filepath = examples / 'boy-1.jpg'
+    im = cv.imread(str(filepath))
+    crops = []
+
+    def crop_jpeg(im_bytes, coords):
+        crops.append(coords)
+        return cv.imencode('.jpg', im[coords.y1:coords.y2, coords.x1:coords.x2])[1].tobytes()
+
+    monkeypatch.setattr('profile_photo.utils.create_headshot.get_backend', lambda: 'jpegtran')
+    monkeypatch.setattr('profile_photo.utils.create_headshot.crop_jpeg', crop_jpeg)
+
+    expected = create_headshot(filepath, **boy_kwargs)
+    photo = create_headshot(filepath, lossless=True, **boy_kwargs)
+
+    # the backend crops at the best fit, aligned to the MCU grid, and the
+    # full image is not decoded
+    mcu_size = get_im_header(filepath.read_bytes()).mcu_size
+    assert crops == [align_to_mcu(expected.coordinates, mcu_size)]
+    assert photo.coordinates == crops[0]
+    assert photo.timings.decode == 0
+
+    # ... but not when the output is re-encoded
+    create_headshot(filepath, lossless=True, encoding=Encoding(quality=50), **boy_kwargs)
+    assert len(crops) == 1
+
+
+def test_create_headshots_without_original(examples, fake_rekognition):
+    filepath = examples / 'boy-1.jpg'
+    im_bytes = filepath.read_bytes()
+
+    expected = create_headshot(filepath)
+    results = list(create_headshots([filepath, im_bytes], keep_original=False))
+    photo_from_file, photo = (r.photo for r in sorted(results, key=lambda r: r.index))
+
+    assert photo._original_im_bytes is None
+    assert photo.im_bytes == expected.im_bytes
+    assert photo.coordinates == expected.coordinates
+    assert expected.coordinates.x2 - expected.coordinates.x1 == expected.image.width
+
+    # the original image is read from the local file, or passed in
+    assert photo_from_file.side_by_side_image.size == expected.side_by_side_image.size
+    with pytest.raises(ValueError):
+        _ = photo.original_image
+    assert photo.get_side_by_side_image(im_bytes).size == expected.side_by_side_image.size
+
+    expected.clear_cache(original=True)
+    assert 'side_by_side_image' not in vars(expected) and 'image' not in vars(expected)
+    assert expected._original_im_bytes is None
+
+
+@pytest.mark.parametrize('orientation', [1, 6])
+def test_render_crop_plan(examples, boy_kwargs, rotated_im_bytes, orientation):
+    filepath = examples / 'boy-1.jpg'
+    im_bytes = rotated_im_bytes(filepath.name, orientation)
+
+    photo = create_headshot(im_bytes, **boy_kwargs)
+    # the image data is only hashed when the plan is used
+    assert photo._crop_plan.image_hash is None
+
+    plan = CropPlan.from_json(photo.crop_plan.to_json())
+
+    assert plan == photo.crop_plan
+    assert plan.coordinates == photo.coordinates
+    assert plan.orientation == photo.orientation
+
+    # the same photo is rendered, without the API responses
+    rendered = render_crop_plan(plan, im_bytes)
+    assert rendered.im_bytes == photo.im_bytes
+    assert rendered.faces is None and rendered.timings.best_fit == 0
+
+    # ... or at another size and format
+    rendered = render_crop_plan(plan, im_bytes, max_size=(64, 64),
+                                encoding=Encoding('png'))
+    assert rendered.image.format == 'PNG' and max(rendered.image.size) == 64
+
+    with pytest.raises(ImageMismatch):
+        render_crop_plan(plan, (examples / 'girl-1.jpg').read_bytes())
+
+
+def test_create_headshot_with_analysis_size(monkeypatch, responses):
+    analysis_size = 640
+    # random noise, to ensure the image (as PNG) is > 5MB in size
+    im = np.random.default_rng(0).integers(0, 256, (1400, 1500, 3), dtype=np.uint8)
+    im_bytes = cv.imencode('.png', im)[1].tobytes()
+    assert len(im_bytes) > 5_000_000
+
+    sent_ims = []
+
+    def fake_api(model_cls, api):
+        def detect(_self, _bucket, _key, analysis_im_bytes, _debug, **_kwargs):
+            sent_ims.append(cv.imdecode(
+                np.frombuffer(analysis_im_bytes, dtype=np.uint8), cv.IMREAD_COLOR))
+            return load_to_model(model_cls, responses / f'boy-1_{api}.json', api)
+
+        return detect
+
+    monkeypatch.setattr(Rekognition, 'detect_faces', fake_api(DetectFacesResp, 'DetectFaces'))
+    monkeypatch.setattr(Rekognition, 'detect_labels', fake_api(DetectLabelsResp, 'DetectLabels'))
+
+    photo = create_headshot(im_bytes, file_ext='.png', analysis_size=analysis_size)
+
+    assert len(sent_ims) == 2
+    for sent_im in sent_ims:
+        assert sent_im.shape[:2] == (597, 640)
+
+    # the crop is taken from the full-resolution image
+    assert photo.image.width > analysis_size * 0.3
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_create_headshots(examples, fake_rekognition, processes):
+    inputs = [examples / image for image in images]
+    # image data as bytes
+    inputs.append((examples / 'boy-1.jpg').read_bytes())
+    # an image which can't be processed
+    inputs.append(examples / 'missing.jpg')
+
+    results = list(create_headshots(inputs, io_workers=4, cpu_workers=2,
+                                    max_pending=3, processes=processes))
+
+    assert sorted(r.index for r in results) == list(range(len(inputs)))
+    assert len(fake_rekognition) == 2 * (len(images) + 1)
+
+    for r in results:
+        assert r.input is inputs[r.index]
+        if r.index == len(inputs) - 1:
+            assert not r.ok
+            assert isinstance(r.error, FileNotFoundError)
+        else:
+            assert r.ok
+            assert r.photo.image.size
+            assert r.photo.side_by_side_image.size
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_create_headshots_error_after_read(monkeypatch, examples, fake_rekognition, processes):
+    inputs = [examples / image for image in images[:4]]
+    reported = []
+
+    def on_timings(timings):
+        reported.append(timings)
+        # the first photo fails after it's rendered
+        if len(reported) == 1:
+            raise ValueError('cannot report timings')
+
+    results = list(create_headshots(inputs, io_workers=2, cpu_workers=2, max_pending=2,
+                                    processes=processes, on_timings=on_timings))
+
+    assert sorted(r.index for r in results) == list(range(len(inputs)))
+    errors = [r.error for r in results if not r.ok]
+    assert len(errors) == 1 and str(errors[0]) == 'cannot report timings'
+
+    # ... or before its I/O calls are made
+    def io_calls(job):
+        raise RuntimeError('cannot call APIs')
+
+    monkeypatch.setattr(main._HeadshotJob, 'io_calls', io_calls)
+
+    results = list(create_headshots(inputs, io_workers=2, max_pending=2, processes=processes))
+
+    assert sorted(r.index for r in results) == list(range(len(inputs)))
+    assert all(isinstance(r.error, RuntimeError) for r in results)
+
+
+def test_render_shared_releases_memory_on_error(monkeypatch, caplog):
+    def render(im_bytes, **_kwargs):
+        im = np.frombuffer(im_bytes, np.uint8)  # noqa: F841
+        raise ValueError('cannot render')
+
+    monkeypatch.setattr(main, '_render', render)
+
+    shm = SharedMemory(create=True, size=16)
+    try:
+        with pytest.raises(ValueError, match='cannot render'):
+            main._render_shared(shm.name, 16, {})
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # the shared memory is closed, though the traceback references an array
+    assert 'still referenced' not in caplog.text
+
+
+def test_create_headshot_async(examples, fake_rekognition):
+
+    async def main():
+        semaphore = asyncio.Semaphore(3)
+        return await asyncio.gather(*[
+            create_headshot_async(examples / image, semaphore=semaphore)
+            for image in images
+        ])
+
+    photos = asyncio.run(main())
+
+    assert len(photos) == len(images)
+    assert len(fake_rekognition) == 2 * len(images)
+    for photo in photos:
+        assert photo.image.size
+
+
+@pytest.mark.parametrize('image', ['hoodie-1.jpg', 'woman-2.jpeg', 'wonder-woman-1.jpeg'])
+def test_create_headshot_with_opencv_detector(examples, responses, image):
+    filepath = examples / image
+
+    photo = create_headshot(filepath, detector=OpenCVDetector(), debug=DEBUG)
+
+    # face is close to the one detected by Rekognition
+    face = photo.faces.get_face().bounding_box
+    expected = load_to_model(DetectFacesResp,
+                             responses / f'{filepath.stem}_DetectFaces.json',
+                             'faces').get_face().bounding_box
+
+    assert abs((face.left + face.width / 2) - (expected.left + expected.width / 2)) < 0.03
+    assert abs((face.top + face.height / 2) - (expected.top + expected.height / 2)) < 0.03
+    assert photo.image.size
+
+
+def test_detector_subclass_must_implement_detect():
+    class FacesOnly(Detector):
+        def detect_faces(self, bucket, key, im_bytes=None, debug=False):
+            return DetectFacesResp([])
+
+    with pytest.raises(TypeError):
+        FacesOnly()
+
+
+def test_face_detail_field_order():
+    box = BoundingBox(0.2, 0.3, 0.4, 0.1)
+    # the fields are in the same order as before, so that positional
+    # arguments still work
+    face = FaceDetail(box, *[None] * 9, [], [], None, None, 99.5)
+
+    assert face.confidence == 99.5 and face.emotions == []
+
+
+def test_create_headshot_with_opencv_detector_raises_no_face():
+    im = np.full((200, 300, 3), 127, dtype=np.uint8)
+    im_bytes = cv.imencode('.jpg', im)[1].tobytes()
+
+    with pytest.raises(NoFaceDetected):
+        _ = create_headshot(im_bytes, detector=OpenCVDetector())
+
+
+def test_create_headshot_timings(examples, boy_kwargs, tmp_path):
+    filepath = examples / 'boy-1.jpg'
+    reported = []
+
+    photo = create_headshot(
+        filepath,
+        **boy_kwargs,
+        output_dir=tmp_path,
+        on_timings=reported.append,
+    )
+
+    timings = photo.timings
+    assert reported == [timings]
+
+    for stage in ('read', 'load_to_model', 'orientation', 'best_fit',
+                  'decode', 'transform', 'encode', 'save'):
+        assert timings.as_dict()[stage] > 0, stage
+
+    # no API calls are made
+    assert timings.s3_get == timings.detect_faces == timings.detect_labels == 0
+    assert timings.total >= timings.read + timings.decode + timings.encode
+
+
+def test_create_headshots_faces_first(examples, fake_rekognition):
+    policy = FacesFirst()
+
+    results = list(create_headshots([examples / image for image in images],
+                                    faces_first=policy))
+
+    assert all(r.ok for r in results)
+
+    labels_calls = [stem for api, stem in fake_rekognition if api == 'DetectLabels']
+    faces_calls = [stem for api, stem in fake_rekognition if api == 'DetectFaces']
+
+    assert len(faces_calls) == len(images)
+    assert len(labels_calls) == policy.stats.calls
+    assert policy.stats.calls + policy.stats.skipped == len(images)
+    # images with multiple faces need the person box
+    assert policy.stats.reasons['multiple_faces'] == 2
+    assert {'construction-worker-1', 'wonder-woman-1'} <= set(labels_calls)
+
+    # the centered portraits skip DetectLabels, and the crops (without the
+    # person box) are close to the ones with it
+    assert {'hoodie-1', 'man-1'}.isdisjoint(labels_calls)
+
+    expected = {r.index: r.photo for r in create_headshots(
+        [examples / image for image in images])}
+
+    for r in results:
+        c, e = r.photo.coordinates, expected[r.index].coordinates
+        tolerance = 0.02 * max(r.photo.original_image.size)
+        assert max(abs(c.x1 - e.x1), abs(c.y1 - e.y1),
+                   abs(c.x2 - e.x2), abs(c.y2 - e.y2)) <= tolerance, images[r.index]
+
+
+def test_faces_first_skips_labels_for_centered_face():
+    faces = DetectFacesResp.from_dict({'FaceDetails': [
+        {'BoundingBox': {'Width': 0.2, 'Height': 0.35, 'Left': 0.4, 'Top': 0.2},
+         'Confidence': 99.9},
+    ]})
+    policy = FacesFirst()
+
+    assert policy.labels_reason(faces) is None
+
+    # a large region above the head
+    faces.face_details[0].bounding_box.top = 0.5
+    assert policy.labels_reason(faces) == 'headroom'
+
+    assert policy.stats.skipped == policy.stats.calls == 1
+    assert policy.stats.skip_rate == 0.5
+
+
+def test_faces_first_keeps_crop_for_narrow_person(monkeypatch):
+    # a small, centered face, where the person box (3x the width of the
+    # face) is narrower than the crop around the face
+    faces = {'FaceDetails': [
+        {'BoundingBox': {'Width': 0.1, 'Height': 0.15, 'Left': 0.45, 'Top': 0.2},
+         'Confidence': 99.9},
+    ]}
+    labels = {'Labels': [
+        {'Name': 'Person', 'Confidence': 99.9, 'Parents': [], 'Instances': [
+            {'BoundingBox': {'Width': 0.3, 'Height': 0.8, 'Left': 0.35, 'Top': 0.2},
+             'Confidence': 99.9},
+        ]},
+    ]}
+    monkeypatch.setattr(Rekognition, 'detect_faces',
+                        lambda *_args, **_kwargs: DetectFacesResp.from_dict(faces))
+    monkeypatch.setattr(Rekognition, 'detect_labels',
+                        lambda *_args, **_kwargs: DetectLabelsResp.from_dict(labels))
+
+    im_bytes = cv.imencode('.jpg', np.zeros((1000, 1000, 3), np.uint8))[1].tobytes()
+    policy = FacesFirst()
+
+    photo = create_headshot(im_bytes, faces_first=policy)
+    expected = create_headshot(im_bytes)
+
+    assert photo.coordinates == expected.coordinates
+    assert policy.stats.reasons == {'narrow_person': 1}
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_create_headshot_all_faces(examples, responses, tmp_path, processes):
+    filepath = examples / 'wonder-woman-1.jpeg'
+    kwargs = dict(
+        faces=responses / f'{filepath.stem}_DetectFaces.json',
+        labels=responses / f'{filepath.stem}_DetectLabels.json',
+    )
+
+    photos = create_headshot(filepath, all_faces=True, output_dir=tmp_path, **kwargs)
+    expected = create_headshot(filepath, **kwargs)
+
+    assert [p.face_index for p in photos] == [0, 1, 2]
+    # the primary face is cropped the same way as before
+    assert photos[0].image.size == expected.image.size
+    assert len({p.im_bytes for p in photos}) == 3
+    # the image is decoded only once
+    assert photos[0].timings is photos[2].timings
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'wonder-woman-1-1-out.jpeg', 'wonder-woman-1-2-out.jpeg', 'wonder-woman-1-out.jpeg',
+    ]
+
+    result, = create_headshots([filepath], all_faces=True, processes=processes, **kwargs)
+
+    assert result.photo is result.photos[0]
+    assert [p.im_bytes for p in result.photos] == [p.im_bytes for p in photos]
+    assert result.photos[1].side_by_side_image.size
+
+
+@pytest.mark.parametrize('parse_mode', ['lazy', 'minimal'])
+def test_create_headshot_parse_mode(examples, responses, parse_mode):
+    filepath = examples / 'wonder-woman-1.jpeg'
+    kwargs = dict(
+        faces=responses / f'{filepath.stem}_DetectFaces.json',
+        labels=responses / f'{filepath.stem}_DetectLabels.json',
+    )
+
+    photos = create_headshot(filepath, all_faces=True, parse_mode=parse_mode, **kwargs)
+    expected = create_headshot(filepath, all_faces=True, **kwargs)
+
+    assert [p.im_bytes for p in photos] == [p.im_bytes for p in expected]
+    # responses are fully loaded by default
+    assert type(expected[0].faces.face_details) is list
+    assert type(expected[0].labels.labels) is list
+
+    # responses are saved with all the fields
+    for resp, param in ((photos[0].faces, 'faces'), (photos[0].labels, 'labels')):
+        assert resp.to_dict() == load_to_model(type(resp), kwargs[param], param).to_dict()
+
+
+def test_load_labels_lazily(responses):
+    data = json.loads((responses / 'boy-1_DetectLabels.json').read_text())
+    labels = DetectLabelsResp.load(data, 'lazy')
+
+    assert labels.person_boxes == DetectLabelsResp.from_dict(data).person_boxes
+    # only the 'Person' label is loaded
+    assert [label.name for label in labels.labels._items if label] == ['Person']
+    assert labels == DetectLabelsResp.load(data, 'full')
+
+
+@pytest.mark.parametrize('orientation', [1, 3, 6, 8])
+def test_probe_jpeg_header(examples, rotated_im_bytes, orientation):
+    im_bytes = rotated_im_bytes('boy-1.jpg', orientation)
+    pil_im = Image.open(BytesIO(im_bytes))
+
+    header = probe_jpeg_header(im_bytes[:HEADER_PROBE_SIZE])
+
+    # the sampling factors of each component, e.g. 2x2 for 4:2:0 subsampling
+    mcu_size = (8 * max(h for _, h, _, _ in pil_im.layer),
+                8 * max(v for _, _, v, _ in pil_im.layer))
+
+    assert header == ImageHeader('JPEG', pil_im.width, pil_im.height,
+                                 pil_im.getexif().get(0x0112), mcu_size)
+    assert header.is_rotated == (orientation != 1)
+
+    # the start of frame is not within the data
+    assert probe_jpeg_header(im_bytes[:100]) is None
+
+
+def test_get_im_header_falls_back_to_pil(examples):
+    header = get_im_header((examples / 'woman-1.png').read_bytes())
+
+    assert header == ImageHeader('PNG', 526, 797, 1)
+    assert probe_jpeg_header((examples / 'woman-1.png').read_bytes()) is None
@@ -0,0 +1,146 @@
+"""Unit Tests for caching of Rekognition API responses."""
+import asyncio
+import json
+
+import pytest
+
+from profile_photo.utils.aws.rekognition import Rekognition
+from profile_photo.utils.aws.response_cache import DiskCache, ResponseCache, SQLiteCache
+
+
+@pytest.fixture(params=['disk', 'sqlite'])
+def cache_factory(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == 'disk':
+            return DiskCache(tmp_path / 'cache', **kwargs)
+        return SQLiteCache(tmp_path / 'cache.db', **kwargs)
+
+    return factory
+
+
+def test_cache_hit_and_miss(cache_factory):
+    cache = cache_factory()
+
+    image_id = cache.image_id(im_bytes=b'image-data')
+    key = cache.make_key('DetectLabels', image_id, {'MinConfidence': 55})
+
+    assert cache.get(key) is None
+    cache.set(key, {'Labels': []})
+    assert cache.get(key) == {'Labels': []}
+
+    # API parameters are part of the key
+    other_key = cache.make_key('DetectLabels', image_id, {'MinConfidence': 60})
+    assert cache.get(other_key) is None
+
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+    assert len(cache) == 1
+
+
+def test_cache_ttl(cache_factory):
+    cache = cache_factory(ttl=0)
+    cache.set('key', {'Labels': []})
+
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used(cache_factory):
+    cache = cache_factory(max_bytes=300)
+
+    cache.set('a', {'Data': 'a' * 100})
+    cache.set('b', {'Data': 'b' * 100})
+    # mark `a` as recently used
+    assert cache.get('a')
+    cache.set('c', {'Data': 'c' * 100})
+
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    assert cache.stats.evictions == 1
+
+
+def test_disk_cache_shared_between_instances(tmp_path):
+    a = DiskCache(tmp_path / 'cache')
+    b = DiskCache(tmp_path / 'cache')
+
+    a.set('key', {'Labels': []})
+
+    assert b.get('key') == {'Labels': []}
+    assert len(b) == 1
+
+    b.clear()
+    assert a.get('key') is None
+
+
+def test_cache_subclass_must_implement_storage():
+    class NoStorage(ResponseCache):
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        NoStorage()
+
+
+def test_rekognition_uses_cache(cache_factory):
+    cache = cache_factory()
+    calls = []
+
+    def detect_labels(**kwargs):
+        calls.append(kwargs)
+        return {'Labels': [], 'ResponseMetadata': {'RequestId': '123'}}
+
+    client = Rekognition(cache=cache)
+
+    for _ in range(3):
+        resp = client._call_api('DetectLabels', detect_labels, None, None,
+                                b'image-data', MinConfidence=55)
+        assert resp == {'Labels': []}
+
+    assert len(calls) == 1
+    assert cache.stats.hits == 2
+
+
+def test_rekognition_uses_cache_async(cache_factory):
+    cache = cache_factory()
+    calls = []
+
+    async def detect_labels(**kwargs):
+        calls.append(kwargs)
+        return {'Labels': [], 'ResponseMetadata': {'RequestId': '123'}}
+
+    client = Rekognition(cache=cache)
+
+    async def call_api():
+        return await client._call_api_async('DetectLabels', detect_labels, None, None,
+                                            b'image-data', MinConfidence=55)
+
+    for _ in range(3):
+        assert asyncio.run(call_api()) == {'Labels': []}
+
+    assert len(calls) == 1
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+
+def test_detect_faces_cached_per_attributes_profile(monkeypatch, cache_factory, responses):
+    data = json.loads((responses / 'boy-1_DetectFaces.json').read_text())
+    calls = []
+
+    class FakeClient:
+        @staticmethod
+        def detect_faces(**kwargs):
+            calls.append(kwargs['Attributes'])
+            return data
+
+    monkeypatch.setattr(Rekognition, 'client', property(lambda _self: FakeClient))
+    client = Rekognition(cache=cache_factory())
+
+    faces = {attributes: client.detect_faces(None, None, b'image-data', attributes=attributes)
+             for attributes in ('all', 'default', 'minimal')}
+
+    # the minimal and default profiles make the same request
+    assert calls == [['ALL'], ['DEFAULT']]
+
+    # the minimal profile only loads the bounding box
+    face = faces['minimal'].get_face()
+    assert face.bounding_box == faces['all'].get_face().bounding_box
+    assert face.age_range is face.pose is None
+    assert faces['default'].get_face().age_range is not None